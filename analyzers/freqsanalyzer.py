@@ -6,75 +6,90 @@
 uno con la cantidad de frecuencias promedio (computada por posting) y otro con
 las frecuencias promedio escalada a log2.
 - Autor: Agustín González
-- Modificado: 26/06/18
+- Modificado: 15/10/26
 '''
 
 import os
 import sys
-import ast
-import math
 from collections import Counter
 
 try:
     sys.path.append('..')
     from lib.other import utils
+    from lib.index import encoderstats
 except:
     raise Exception("Imposible cargar librerías.")
 
 # Path de archivo a analizar.
-FILE_TO_ANALYZE = "../output/test/index-2/other/encoder_freqs_statistics.txt"
+FILE_TO_ANALYZE = "../output/test/index-2/other/encoder_freqs_statistics.bin"
 
 # Output de análisis.
 OUTPUT_DIR = "../output/stats/index-2/"
 
+# Buffer de lectura/escritura de archivos: 1 MiB.
+BUFFER_SIZE = 1024**2
+
+
+def round_log2(number):
+    '''Retorna el log2 (redondeado) del entero positivo dado, sin recurrir a
+    aritmética de punto flotante. Nota: log2(n) >= k + 0.5 si, y sólo si,
+    n^2 >= 2^(2k + 1), siendo k = floor(log2(n)).
+
+    Args:
+        number (int): número del que se requiere el log2.
+
+    Returns:
+        log2 (int): log2 redondeado del número.
+    '''
+    log2 = number.bit_length() - 1
+    if number * number >= 1 << (2*log2 + 1):
+        log2 += 1
+    return log2
+
 
 def analyze():
     '''Ejecuta análisis.'''
     posting_count = 0
     freq_avg_counter = Counter()
 
-    reader = open(FILE_TO_ANALYZE)
-    for line in reader:
-        spplited = line[:-1].split(";")
-        posting = spplited[2].split(":")[1].strip()
+    # Conteo de frecuencias escalado a log2 (computado en la misma pasada).
+    freq_avg_counter_log2 = Counter()
 
+    records = encoderstats.read_records(FILE_TO_ANALYZE,
+                                        encoderstats.FREQS_TYPECODE,
+                                        BUFFER_SIZE)
+    for _, _, posting in records:
         posting_count += 1
 
-        # Literal eval de posting.
-        posting = ast.literal_eval(posting)
-
-        avg = round(sum(posting)/len(posting), 0)
+        avg = int(round(sum(posting)/len(posting), 0))
         freq_avg_counter[avg] += 1
+        freq_avg_counter_log2[round_log2(avg)] += 1
 
-    # Conteo de frecuencias escalado a log2.
-    freq_avg_counter_log2 = Counter()
+    header = "Total de postings: {0} (Archivo analizado: {1})\n\n"
+    header = header.format(posting_count, FILE_TO_ANALYZE)
 
-    to_write = "Total de postings: {0} (Archivo analizado: {1})\n\n"
-    to_write = to_write.format(posting_count, FILE_TO_ANALYZE)
-    to_write_log2 = str(to_write)
-
-    to_write += "Frecuencia promedio\tCantidad de postings\n"
-    to_write_log2 += "Frecuencia promedio (log2)\tCantidad de postings\n"
+    to_write = [header, "Frecuencia promedio\tCantidad de postings\n"]
+    to_write_log2 = [header,
+                     "Frecuencia promedio (log2)\tCantidad de postings\n"]
 
     # Original.
     for f in sorted(freq_avg_counter):
-        to_write += "{0}\t{1}\n".format(int(f), freq_avg_counter[f])
-
-        # To log2.
-        log2 = int(round(math.log(f, 2), 0))
-        freq_avg_counter_log2[log2] += freq_avg_counter[f]
+        to_write.append("{0}\t{1}\n".format(f, freq_avg_counter[f]))
 
     # log2.
     for f in sorted(freq_avg_counter_log2):
-        to_write_log2 += "{0}\t{1}\n".format(int(f), freq_avg_counter_log2[f])
+        count = freq_avg_counter_log2[f]
+        to_write_log2.append("{0}\t{1}\n".format(f, count))
 
     # Archivo con datos 'originales'.
-    writer = open(OUTPUT_DIR + "/freqsanalyzer.txt", "w")
-    writer.write(to_write)
+    path = OUTPUT_DIR + "/freqsanalyzer.txt"
+    with open(path, "w", buffering=BUFFER_SIZE) as writer:
+        writer.write("".join(to_write))
 
     # Archivo con frecuencias escaladas a log2.
-    writer = open(OUTPUT_DIR + "/freqsanalyzer_log2.txt", "w")
-    writer.write(to_write_log2)
+    path = OUTPUT_DIR + "/freqsanalyzer_log2.txt"
+    with open(path, "w", buffering=BUFFER_SIZE) as writer:
+        writer.write("".join(to_write_log2))
 
 
 def main(args):
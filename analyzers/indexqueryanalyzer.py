@@ -2,13 +2,21 @@
 # -*- coding: utf-8 -*-
 '''
 - Nombre: indexqueryanalyzer.py
-- Descripción: tester de queries a directorio de índices.
+- Descripción: tester de queries a directorio de índices. El test en disco
+se ejecuta en un subproceso, en paralelo al test en memoria. Este último
+utiliza 'IN_MEMORY_TEST_WORKERS' subprocesos (por defecto, 1): cada uno carga
+la info de chunks de un índice completo a RAM, por lo que a mayor cantidad,
+mayor es el pico de memoria, y los tiempos medidos se ven afectados por la
+competencia de caché y ancho de banda de memoria (dejan de ser comparables
+con los obtenidos con un único subproceso).
 - Autor: Agustín González
-- Modificado: 10/04/18
+- Modificado: 15/10/26
 '''
 
 import sys
+import mmap
 import multiprocessing
+from functools import partial
 from os import path, walk
 
 try:
@@ -33,16 +41,14 @@ QUERIES_COUNT = 3000
 # que se realiza una iteración extra a modo de 'warm-up'.
 ITERATIONS = 2
 
+# Cantidad de subprocesos del test en memoria (ver docstring del módulo): un
+# valor mayor a 1 reduce el tiempo total a costa de la fidelidad de los
+# tiempos medidos y de mayor consumo de memoria.
+IN_MEMORY_TEST_WORKERS = 1
+
 
 def main(args):
     '''Punto de entrada.'''
-    # Lectura de queries.
-    print(">> Cargando queries...")
-    queries = []
-    for line in open(QUERIES_PATH, "r"):
-        line = line[:-1]
-        queries.append(line)
-
     # Lectura de vocabulario.
     print(">> Cargando vocabulario...")
     index = Index(IDX_VOC_PATH)
@@ -50,26 +56,45 @@ def main(args):
     vocabulary = index.get_vocabulary().keys()
     del index
 
-    # 2 threads simultáneos máximo.
-    pool = multiprocessing.Pool(2)
-
     # Directorios a evaluar.
     idxdirs = [path.join(IDXS_DIR, x) for x in sorted(next(walk(IDXS_DIR))[1])]
 
     queryev = IndexQueryTester(STATS_BASE_DIROUT, ITERATIONS)
-    queryev.set_queries(queries, vocabulary, QUERIES_COUNT)
+
+    # Lectura de queries.
+    print(">> Cargando queries...")
+    # Nota: el archivo se mapea en memoria y sus líneas se leen (y decodifican)
+    # a demanda, hasta que se seleccionan 'QUERIES_COUNT' queries (o finaliza
+    # el archivo).
+    with open(QUERIES_PATH, "rb") as fqueries:
+        with mmap.mmap(fqueries.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            queries = (line.rstrip(b"\n").decode("utf-8")
+                       for line in iter(mm.readline, b""))
+            queryev.set_queries(queries, vocabulary, QUERIES_COUNT)
+
     queryev.set_indexes(idxdirs)
 
     # Testeo de índices.
-    # 1. Test in memory.
-    pool.apply_async(queryev.test_indexes, {True})
-
-    # 2. Test in disk.
-    pool.apply_async(queryev.test_indexes, {False})
+    # 1. Test in disk: los índices se evalúan secuencialmente en un único
+    # subproceso, evitando la competencia por el disco.
+    disk_pool = multiprocessing.Pool(1)
+    disk_test = disk_pool.apply_async(queryev.test_indexes, (False,))
+
+    # 2. Test in memory: se distribuye por índice entre sus propios
+    # subprocesos (pool separado, de forma que la concurrencia no supere
+    # 'IN_MEMORY_TEST_WORKERS'; con el valor por defecto, los índices se
+    # evalúan secuencialmente).
+    memory_pool = multiprocessing.Pool(IN_MEMORY_TEST_WORKERS)
+    test_in_memory = partial(queryev.test_index, chunks_info_in_memory=True)
+    for _ in memory_pool.imap_unordered(test_in_memory, idxdirs,
+                                        chunksize=1):
+        pass
 
     # Espera de finalización de subprocesos.
-    pool.close()
-    pool.join()
+    for pool in (memory_pool, disk_pool):
+        pool.close()
+        pool.join()
+    disk_test.get()
 
 # Entrada de aplicación.
 if __name__ == "__main__":
@@ -31,11 +31,15 @@ def main(args):
     for dir_index in dirs:
         dir_index = os.path.join(INDEXES_DIR, dir_index)
 
+        # Tamaños de archivos del índice: scandir reutiliza la información
+        # obtenida al listar el directorio, evitando un stat por archivo.
+        with os.scandir(dir_index) as entries:
+            sizes = {e.name: e.stat().st_size for e in entries}
+
         writter.write("Índice: {0}\n".format(dir_index))
         for ftype in FILES:
-            path = os.path.join(dir_index, FILES[ftype])
-            size = round(((os.path.getsize(path)/1024)/1024), 2)
-            writter.write("{0}: {1} GiB\n".format(FILES[ftype], size))
+            size = round(sizes[FILES[ftype]]/(1024**2), 2)
+            writter.write("{0}: {1} MiB\n".format(FILES[ftype], size))
         writter.write("\n")
     writter.close()
 
@@ -4,59 +4,77 @@
 - Nombre: multiencodeanalyzer.py
 - Descripción: analizador de estadísticas de documentos y frecuencias.
 - Autor: Agustín González
-- Modificado: 25/04/18
+- Modificado: 15/10/26
 '''
 
+import os
 import sys
-import ast
+import logging
+import multiprocessing
 from enum import Enum
 from collections import Counter
 
 try:
     sys.path.append('..')
     from lib.other import utils
+    from lib.index import encoderstats
 except:
     raise Exception("Imposible cargar librerías.")
 
 
 DIRIN = "../output/web-base/me-me"
 
-FILES_TO_ANALYZE = {"DOCS0": DIRIN + "/other/encoder_docs_statistics.txt",
-                    "DOCS64": DIRIN + "64/other/encoder_docs_statistics.txt",
-                    "DOCS128": DIRIN + "128/other/encoder_docs_statistics.txt",
-                    "DOCS256": DIRIN + "256/other/encoder_docs_statistics.txt",
-                    "FREQS0": DIRIN + "/other/encoder_freqs_statistics.txt",
-                    "FREQS64": DIRIN + "64/other/encoder_freqs_statistics.txt",
-                    "FREQS128": DIRIN + "128/other/encoder_freqs_statistics.txt",
-                    "FREQS256": DIRIN + "256/other/encoder_freqs_statistics.txt"}
+FILES_TO_ANALYZE = {"DOCS0": DIRIN + "/other/encoder_docs_statistics.bin",
+                    "DOCS64": DIRIN + "64/other/encoder_docs_statistics.bin",
+                    "DOCS128": DIRIN + "128/other/encoder_docs_statistics.bin",
+                    "DOCS256": DIRIN + "256/other/encoder_docs_statistics.bin",
+                    "FREQS0": DIRIN + "/other/encoder_freqs_statistics.bin",
+                    "FREQS64": DIRIN + "64/other/encoder_freqs_statistics.bin",
+                    "FREQS128": DIRIN + "128/other/encoder_freqs_statistics.bin",
+                    "FREQS256": DIRIN + "256/other/encoder_freqs_statistics.bin"}
 
 OUTPUT = "../output/stats/web-base/multiencode/"
 
+# Logger de progreso (permite silenciarlo, ej.: durante benchmarks).
+logger = logging.getLogger(__name__)
+
+# Buffer de lectura/escritura de archivos: 1 MiB.
+BUFFER_SIZE = 1024**2
+
+# Cantidad de grupos de postings según cantidad de elementos. Los grupos son
+# potencias de 2: < 32, [32, 64), [64, 128), [128, 256), [256, 512) y >= 512.
+POSTING_GROUPS = 6
+
 
 class StatTypes(Enum):
-    '''Tipo de estadísticas.'''
-    Distance = 0,
-    FirstNumber = 1,
-    PostingLen = 2
+    '''Tipo de estadísticas. El valor de c/tipo es el encabezado con el que
+    se imprimen sus estadísticas.'''
+    Distance = "\n>> Estadísticas de distancia entre elem de postings:"
+    FirstNumber = "\n>> Estadísticas de primer número de posting:"
+    PostingLen = "\n>> Estadísticas de tamaño de posting:"
 
 
-def check_dict_stats(number, encode, min_by_enc, sum_by_enc, max_by_enc):
+def check_dict_stats(number, encode, count, min_by_enc, mean_by_enc,
+                     max_by_enc):
     '''Verifica si el número dado es el nuevo mínimo o máximo, además de
-    añadirlo a la sumatoria de elementos.
+    actualizar el promedio (incremental) de elementos.
 
     Args:
         number (int): número a verificar.
         encode (string): encode a verificar en dicts.
+        count (int): cantidad de elementos del encode (incluyendo el número
+            a verificar).
         min_by_enc (dict): dict de min por encode.
-        sum_by_enc (Counter): dict de sum por encode.
+        mean_by_enc (Counter): dict de promedio por encode.
         max_by_enc (dict): dict de max por encode.
     '''
     # Verificación de mínimo.
     if encode not in min_by_enc or number < min_by_enc[encode]:
         min_by_enc[encode] = number
 
-    # Add a total.
-    sum_by_enc[encode] += number
+    # Actualización de promedio: evita acumular sumatorias de enteros de
+    # precisión arbitraria para luego dividirlas.
+    mean_by_enc[encode] += (number - mean_by_enc[encode]) / count
 
     # Verificación de máximo.
     if encode not in max_by_enc or number > max_by_enc[encode]:
@@ -64,7 +82,7 @@ def check_dict_stats(number, encode, min_by_enc, sum_by_enc, max_by_enc):
 
 
 def print_dict_stats(writer, stype, pcount_by_enc, min_by_enc,
-                     sum_by_enc, max_by_enc):
+                     mean_by_enc, max_by_enc):
     '''Imprime estadísticas de diccionarios.
 
     Args:
@@ -72,26 +90,22 @@ def print_dict_stats(writer, stype, pcount_by_enc, min_by_enc,
         stype (StatTypes): tipo de estadística (distance, firstnum, plen).
         pcount_by_enc (Counter): dict de cantidad de postings por encode.
         min_by_enc (dict): dict de min (stype) por encode.
-        sum_by_enc (Counter): dict de sum (stype) por encode.
+        mean_by_enc (Counter): dict de promedio (stype) por encode.
         max_by_enc (dict): dict de max (stype) por encode.
     '''
-    info = ""
-    if stype == StatTypes.Distance:
-        info += "\n>> Estadísticas de distancia entre elem de postings:"
-    elif stype == StatTypes.FirstNumber:
-        info += "\n>> Estadísticas de primer número de posting:"
-    else:
-        info += "\n>> Estadísticas de tamaño de posting:"
+    info = [stype.value]
 
     for encode in sorted(pcount_by_enc):
-        avg = sum_by_enc[encode] / pcount_by_enc[encode]
-        info += "\nEncode: {0}".format(encode)
-        info += "\n\t- Mínimo: {0}".format(int(round(min_by_enc[encode], 0)))
-        info += "\n\t- Promedio: {0}".format(int(round(avg, 0)))
-        info += "\n\t- Máximo: {0}\n".format(int(round(max_by_enc[encode], 0)))
+        minimum = int(round(min_by_enc[encode], 0))
+        avg = int(round(mean_by_enc[encode], 0))
+        maximum = int(round(max_by_enc[encode], 0))
+        info.append("\nEncode: {0}".format(encode))
+        info.append("\n\t- Mínimo: {0}".format(minimum))
+        info.append("\n\t- Promedio: {0}".format(avg))
+        info.append("\n\t- Máximo: {0}\n".format(maximum))
 
     # print(info)
-    writer.write(info)
+    writer.write("".join(info))
 
 
 def print_posting_stats(writer, encodes, min_posting_by_enc,
@@ -104,13 +118,13 @@ def print_posting_stats(writer, encodes, min_posting_by_enc,
         min_by_enc (dict): dict de min (posting) por encode.
         max_by_enc (dict): dict de max (posting) por encode.
     '''
-    info = ""
+    info = []
     for encode in sorted(encodes):
-        info += "\nEncode: {0}".format(encode)
-        info += "\n\t- Mínimo: {0}".format(min_posting_by_enc[encode])
-        info += "\n\t- Máximo: {0}\n".format(max_posting_by_enc[encode])
+        info.append("\nEncode: {0}".format(encode))
+        info.append("\n\t- Mínimo: {0}".format(min_posting_by_enc[encode]))
+        info.append("\n\t- Máximo: {0}\n".format(max_posting_by_enc[encode]))
 
-    writer.write(info)
+    writer.write("".join(info))
 
 
 def print_posting_stats_by_encode(writer, pcount_by_enc):
@@ -119,12 +133,13 @@ def print_posting_stats_by_encode(writer, pcount_by_enc):
     Args:
         writer (file): archivo de salida.
         pcount_by_enc (dict): diccionario de postings por encode.'''
-    info = "\n>> Postings por encode"
+    info = ["\n>> Postings por encode"]
     for encode in sorted(pcount_by_enc):
-        info += "\n\t- Encode {0}: {1}".format(encode, pcount_by_enc[encode])
+        count = pcount_by_enc[encode]
+        info.append("\n\t- Encode {0}: {1}".format(encode, count))
 
     # print(info)
-    writer.write(info)
+    writer.write("".join(info))
 
 
 def analyze(fid, file_to_analyze):
@@ -134,26 +149,26 @@ def analyze(fid, file_to_analyze):
         fid (string): identificador de archivo a analizar (para output).
         file_to_analyze (string): path de archivo a analizar.
     '''
-    reader = open(file_to_analyze)
+    logger.info("Analizando %s...", fid)
 
-    info = "Estadísticas {0}".format(fid.lower())
+    info = ["Estadísticas {0}".format(fid.lower())]
 
     # Posting count.
     pcount_by_enc = Counter()
 
     # Deltas según encodes.
     min_delta_by_enc = {}
-    sum_delta_by_enc = Counter()
+    mean_delta_by_enc = Counter()
     max_delta_by_enc = {}
 
     # 1st números según encodes.
     min_1stnum_by_enc = {}
-    sum_1stnum_by_enc = Counter()
+    mean_1stnum_by_enc = Counter()
     max_1stnum_by_enc = {}
 
     # Lens según encodes.
     min_len_by_enc = {}
-    sum_len_by_enc = Counter()
+    mean_len_by_enc = Counter()
     max_len_by_enc = {}
 
     min_posting_size = None
@@ -161,44 +176,38 @@ def analyze(fid, file_to_analyze):
     max_posting_size = 0
     max_posting_term = "None"
 
-    # Contador de postings.
-    posting_32_count = 0
-    posting_64_count = 0
-    posting_128_count = 0
-    posting_256_count = 0
-    posting_512_count = 0
-
-    # Sumas de distancias promedio de postings agrupadas según el tamaño.
-    dprom_sum = 0       # Todas las postings.
-    dprom_32_sum = 0    # >= 32 y < 64
-    dprom_64_sum = 0    # >= 64 y < 128
-    dprom_128_sum = 0   # >= 128 y < 256
-    dprom_256_sum = 0   # >= 256 y < 512
-    dprom_512_sum = 0   # >= 512
+    # Contadores de postings y sumas de distancias promedio agrupadas según
+    # el tamaño. Índices: 0 (< 32), 1 (>= 32 y < 64), 2 (>= 64 y < 128),
+    # 3 (>= 128 y < 256), 4 (>= 256 y < 512) y 5 (>= 512).
+    posting_counts = [0] * POSTING_GROUPS
+    dprom_sums = [0] * POSTING_GROUPS
 
-    posting_count = 0
-    for line in reader:
-        spplited = line[:-1].split(";")
-        term = spplited[0].split(":")[1].strip()
-        encode = spplited[1].split(":")[1].strip()
-        posting = spplited[2].split(":")[1].strip()
+    # Suma de distancias promedio de todas las postings.
+    dprom_sum = 0
 
+    posting_count = 0
+    # Typecode de registros binarios según tipo de archivo (docs o freqs).
+    typecode = encoderstats.FREQS_TYPECODE
+    if fid.startswith("DOCS"):
+        typecode = encoderstats.DOCS_TYPECODE
+
+    records = encoderstats.read_records(file_to_analyze, typecode,
+                                        BUFFER_SIZE)
+    for term, encode, posting in records:
         posting_count += 1
 
-        # Literal eval de posting.
-        posting = ast.literal_eval(posting)
-
         # Count de postings por encode.
         pcount_by_enc[encode] += 1
+        count = pcount_by_enc[encode]
 
         # Verificación de first nros.
-        check_dict_stats(posting[0], encode, min_1stnum_by_enc,
-                         sum_1stnum_by_enc, max_1stnum_by_enc)
+        check_dict_stats(posting[0], encode, count, min_1stnum_by_enc,
+                         mean_1stnum_by_enc, max_1stnum_by_enc)
 
         # Verificación de len.
         plen = len(posting)
-        check_dict_stats(plen, encode, min_len_by_enc,
-                         sum_len_by_enc, max_len_by_enc)
+        check_dict_stats(plen, encode, count, min_len_by_enc,
+                         mean_len_by_enc, max_len_by_enc)
 
         # Verificación de estadísticas de postings.
         if min_posting_size is None or plen < min_posting_size:
@@ -211,107 +220,96 @@ def analyze(fid, file_to_analyze):
             max_posting_term = term
 
         # Verificación de distancia promedio.
-        dprom = posting[-1]/len(posting)
+        dprom = posting[-1]/plen
 
-        check_dict_stats(dprom, encode, min_delta_by_enc, sum_delta_by_enc,
-                         max_delta_by_enc)
+        check_dict_stats(dprom, encode, count, min_delta_by_enc,
+                         mean_delta_by_enc, max_delta_by_enc)
 
         # Estadísticas de postings.
         dprom_sum += dprom
-        if len(posting) >= 32 and len(posting) < 64:
-            dprom_32_sum += dprom
-            posting_32_count += 1
-        elif len(posting) >= 64 and len(posting) < 128:
-            dprom_64_sum += dprom
-            posting_64_count += 1
-        elif len(posting) >= 128 and len(posting) < 256:
-            dprom_128_sum += dprom
-            posting_128_count += 1
-        elif len(posting) >= 256 and len(posting) < 512:
-            dprom_256_sum += dprom
-            posting_256_count += 1
-        elif len(posting) >= 512:
-            dprom_512_sum += dprom
-            posting_512_count += 1
+
+        # Grupo de posting: se deriva del log2 del tamaño (bit_length),
+        # lo que evita comparaciones contra c/u de los límites. Ej.: 32
+        # (6 bits) corresponde al grupo 1 y 512 (10 bits), al 5.
+        group = min(POSTING_GROUPS-1, max(0, plen.bit_length()-5))
+        dprom_sums[group] += dprom
+        posting_counts[group] += 1
 
     # Estadísticas de tamaño de posting.
-    info += "\n\n>> Estadísticas de posting:"
-    info += "\nCantidad de postings: {0}".format(posting_count)
+    info.append("\n\n>> Estadísticas de posting:")
+    info.append("\nCantidad de postings: {0}".format(posting_count))
     dprom = round(dprom_sum/posting_count, 2)
-    info += "\nDistancia promedio (total): {0}".format(dprom)
-    info += "\nTamaño de posting:"
-    info += "\n\t- Mínimo: {0}".format(min_posting_size)
+    info.append("\nDistancia promedio (total): {0}".format(dprom))
+    info.append("\nTamaño de posting:")
+    info.append("\n\t- Mínimo: {0}".format(min_posting_size))
     avg_posting_size = int(round(sum_posting_size/posting_count, 0))
-    info += "\n\t- Promedio: {0}".format(avg_posting_size)
-    info += "\n\t- Máximo: {0} - Término: {1}".format(max_posting_size,
-                                                      max_posting_term)
+    info.append("\n\t- Promedio: {0}".format(avg_posting_size))
+    info.append("\n\t- Máximo: {0} - Término: {1}".format(max_posting_size,
+                                                          max_posting_term))
 
     # Estadísticas de postings de más de 64, 128 y 256 elementos.
-    info += "\n\n>> Estadísticas de posting según cantidad de elementos:"
-
-    divisor = 1 if posting_32_count == 0 else posting_64_count
-    dprom = round(dprom_32_sum/divisor, 2)
-    info += "\n>= 32 y < 64:"
-    info += "\n\t- Cantidad de postings: {0}".format(posting_32_count)
-    info += "\n\t- Suma de distancias: {0}".format(round(dprom_32_sum, 2))
-    info += "\n\t- Distancia promedio: {0}\n".format(dprom)
-
-    divisor = 1 if posting_64_count == 0 else posting_64_count
-    dprom = round(dprom_64_sum/divisor, 2)
-    info += "\n>= 64 y < 128:"
-    info += "\n\t- Cantidad de postings: {0}".format(posting_64_count)
-    info += "\n\t- Suma de distancias: {0}".format(round(dprom_64_sum, 2))
-    info += "\n\t- Distancia promedio: {0}\n".format(dprom)
-
-    divisor = 1 if posting_128_count == 0 else posting_128_count
-    dprom = round(dprom_128_sum/divisor, 2)
-    info += "\n>= 128 y < 256:"
-    info += "\n\t- Cantidad de postings: {0}".format(posting_128_count)
-    info += "\n\t- Suma de distancias: {0}".format(round(dprom_128_sum, 2))
-    info += "\n\t- Distancia promedio: {0}\n".format(dprom)
-
-    divisor = 1 if posting_256_count == 0 else posting_256_count
-    dprom = round(dprom_256_sum/divisor, 2)
-    info += "\n>= 256 y < 512:"
-    info += "\n\t- Cantidad de postings: {0}".format(posting_256_count)
-    info += "\n\t- Suma de distancias: {0}".format(round(dprom_256_sum, 2))
-    info += "\n\t- Distancia promedio: {0}\n".format(dprom)
-
-    divisor = 1 if posting_512_count == 0 else posting_512_count
-    dprom = round(dprom_512_sum/divisor, 2)
-    info += "\n>= 512:"
-    info += "\n\t- Cantidad de postings: {0}".format(posting_512_count)
-    info += "\n\t- Suma de distancias: {0}".format(round(dprom_512_sum, 2))
-    info += "\n\t- Distancia promedio: {0}\n".format(dprom)
-
-    writer = open(OUTPUT + fid.lower() + ".txt", "w")
-    writer.write(info)
+    info.append("\n\n>> Estadísticas de posting según cantidad de "
+                "elementos:")
+
+    for group in range(1, POSTING_GROUPS):
+        # Límites del grupo (el último no posee límite superior).
+        lower = 2**(group+4)
+        if group < POSTING_GROUPS-1:
+            bounds = "\n>= {0} y < {1}:".format(lower, lower*2)
+        else:
+            bounds = "\n>= {0}:".format(lower)
+
+        count = posting_counts[group]
+        dsum = round(dprom_sums[group], 2)
+        dprom = round(dprom_sums[group]/max(1, count), 2)
+        info.append(bounds)
+        info.append("\n\t- Cantidad de postings: {0}".format(count))
+        info.append("\n\t- Suma de distancias: {0}".format(dsum))
+        info.append("\n\t- Distancia promedio: {0}\n".format(dprom))
+
+    path = OUTPUT + fid.lower() + ".txt"
+    writer = open(path, "w", buffering=BUFFER_SIZE)
+    writer.write("".join(info))
 
     # Print de stats de distance.
     print_dict_stats(writer, StatTypes.Distance, pcount_by_enc,
-                     min_delta_by_enc, sum_delta_by_enc, max_delta_by_enc)
+                     min_delta_by_enc, mean_delta_by_enc, max_delta_by_enc)
 
     # Print de stats de 1st number.
     print_dict_stats(writer, StatTypes.FirstNumber, pcount_by_enc,
-                     min_1stnum_by_enc, sum_1stnum_by_enc, max_1stnum_by_enc)
+                     min_1stnum_by_enc, mean_1stnum_by_enc, max_1stnum_by_enc)
 
     # Print de stats de len.
     print_dict_stats(writer, StatTypes.PostingLen, pcount_by_enc,
-                     min_len_by_enc, sum_len_by_enc, max_len_by_enc)
+                     min_len_by_enc, mean_len_by_enc, max_len_by_enc)
 
     print_posting_stats_by_encode(writer, pcount_by_enc)
 
-    reader.close()
     writer.close()
 
 
+def configure_logging():
+    '''Configura la salida del logger de progreso. Nota: se invoca también
+    como initializer de los subprocesos, ya que con el método de inicio
+    'spawn' éstos no heredan la configuración del proceso principal (con
+    'fork', la llamada no tiene efecto).'''
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+
 def main(args):
     '''Punto de entrada.'''
+    configure_logging()
     utils.makedirs(OUTPUT)
 
-    for fid in sorted(FILES_TO_ANALYZE):
-        print("Analizando {0}...".format(fid))
-        analyze(fid, FILES_TO_ANALYZE[fid])
+    # Los análisis son independientes entre sí (cada uno escribe su propio
+    # archivo de salida), por lo que se distribuyen en subprocesos.
+    pool_size = min(len(FILES_TO_ANALYZE), os.cpu_count() or 1)
+    pool = multiprocessing.Pool(pool_size, configure_logging)
+    pool.starmap(analyze, sorted(FILES_TO_ANALYZE.items()))
+
+    # Espera de finalización de subprocesos.
+    pool.close()
+    pool.join()
 
 
 # Entrada de aplicación.
@@ -29,13 +29,12 @@ def parse_encode(plain_encodes):
     '''
     encodes = [x.strip() for x in plain_encodes.split(",")]
 
+    # Nota: el indexador distingue mono y multiencode según se trate de un
+    # único EncodeTypes o de una lista, por lo que se preserva dicho retorno.
     if len(encodes) == 1:
         return EncodeTypes[encodes[0]]
 
-    parsed_encodes = []
-    for encode in encodes:
-        parsed_encodes.append(EncodeTypes[encode])
-    return parsed_encodes
+    return [EncodeTypes[encode] for encode in encodes]
 
 
 def create_index_by_args(args):
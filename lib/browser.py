@@ -6,7 +6,7 @@
 diversos tipos ('BrowseType'), en un índice determinado. Nota: sólo se ha
 implementado la búsqueda booleana de tipo AND.
 - Autor: Agustín González
-- Modificado: 08/04/18
+- Modificado: 15/10/26
 '''
 
 import time
@@ -31,7 +31,8 @@ class Browser(object):
         self.__index = index
         self.__browse_type = browse_type
 
-        # Fecha de inicio y finalización de última query (para benchmark).
+        # Fecha de inicio y finalización (en nanoseg.) de última query (para
+        # benchmark).
         self.__last_browse_start_date = None
         self.__last_browse_end_date = None
 
@@ -42,8 +43,32 @@ class Browser(object):
             seconds (float): diferencia entre fecha de fin y de inicio de la
                 última búsqueda realizada.
         '''
+        return self.get_benchmark_ns() / 10**9
+
+    def get_benchmark_ns(self):
+        '''Retorna la cantidad de nanoseg. en los que se realizó la última
+        búsqueda (entero: evita la pérdida de precisión al acumular tiempos).
+
+        Returns:
+            nanoseconds (int): diferencia entre fecha de fin y de inicio de la
+                última búsqueda realizada.
+        '''
         return self.__last_browse_end_date - self.__last_browse_start_date
 
+    @staticmethod
+    def get_terms(text):
+        '''Retorna los términos (sanitizados) a buscar del texto especificado.
+
+        Args:
+            text (string): texto a buscar.
+
+        Returns:
+            terms (string set): términos sanitizados.
+        '''
+        # Split y sanitización: trim, lower de términos y eliminación de
+        # repetidos y vacíos (producto de espacios consecutivos).
+        return {t.strip().lower() for t in text.split(" ") if t}
+
     def browse(self, text):
         '''Busca, en el índice dado, el texto especificado.
 
@@ -53,21 +78,28 @@ class Browser(object):
         Returns:
             docs (int list): ids de documentos con los que hay match.
         '''
-        # Split de términos.
-        terms = text.split(" ")
+        return self.browse_terms(Browser.get_terms(text))
 
-        # Sanitización: trim, lower de términos y eliminación de repetidos.
-        terms = list(set([t.strip().lower() for t in terms]))
+    def browse_terms(self, terms):
+        '''Busca, en el índice dado, los términos especificados. Permite
+        evitar la sanitización del texto cuando una misma búsqueda se repite
+        (ver 'get_terms').
 
+        Args:
+            terms (string iterable): términos sanitizados.
+
+        Returns:
+            docs (int list): ids de documentos con los que hay match.
+        '''
         # Documentos recuperados.
         docs = []
 
-        self.__last_browse_start_date = time.time()
+        self.__last_browse_start_date = time.perf_counter_ns()
 
         # if self.__browse_type == BrowseType.Boolean:
         docs = self.__browse_boolean(terms)
 
-        self.__last_browse_end_date = time.time()
+        self.__last_browse_end_date = time.perf_counter_ns()
 
         return docs
 
@@ -75,18 +107,40 @@ class Browser(object):
         '''Realiza búsqueda booleana (AND), en base a términos especificados.
 
         Args:
-            terms (string list): términos sanitizados.
+            terms (string iterable): términos sanitizados.
 
         Returns:
             docs (int list): ids de documentos con los que hay match.
         '''
-        # Obtención de posting de primer término.
-        docs = set(self.__index.get_posting_by_term(terms.pop(0)).keys())
-
-        # Recuperación de postings de términos restantes.
-        for term in terms:
-            # Intersección de docs y term_docs.
-            term_docs = self.__index.get_posting_by_term(term)
-            docs = set.intersection(docs, term_docs)
-
-        return sorted(list(docs))
+        index = self.__index
+
+        # Obtención de punteros a postings, ordenados de menor a mayor tamaño:
+        # de esta forma se minimiza el tamaño de las intersecciones
+        # intermedias.
+        pointers = [index.get_posting_pointer_by_term(t) for t in terms]
+
+        # Sin términos a buscar, o con algún término inexistente (AND).
+        if not pointers or not all(pointers):
+            return []
+
+        pointers.sort(key=lambda p: p.posting_count)
+
+        # Solicitud de lectura anticipada de las postings restantes: mientras
+        # se decodifica la primera (la más corta, que se lee de inmediato), el
+        # sistema operativo carga las siguientes.
+        index.prefetch_postings(pointers[1:])
+
+        # Nota: sólo se requieren los docs de cada posting (no sus freqs), por
+        # lo que se evita construir el dict de la posting.
+        docs = set(index.get_posting_lists_by_pointer(pointers[0])[0])
+
+        # Intersección (in-place) de docs con las postings restantes. Nota:
+        # las postings sólo se decodifican mientras la intersección no es
+        # vacía.
+        for pointer in pointers[1:]:
+            if not docs:
+                break
+            posting_docs = index.get_posting_lists_by_pointer(pointer)[0]
+            docs.intersection_update(posting_docs)
+
+        return sorted(docs)
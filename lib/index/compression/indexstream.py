@@ -5,9 +5,16 @@
 - Descripción: contiene las clases 'IndexStreamReader' e 'IndexStreamWriter',
 las cuales permiten gestionar el stream de datos que representa un índice.
 - Autor: Agustín González
-- Modificado: 17/04/18
+- Modificado: 15/10/26
 '''
 
+import os
+import sys
+import mmap
+from array import array
+from functools import lru_cache
+from itertools import accumulate
+
 from .ircodecs import EncodeTypes
 from .ircodecs import vbencoder as vbenc
 from .ircodecs import unaryencoder as unaryenc
@@ -19,15 +26,91 @@ from .ircodecs import pforencoder as pfdenc
 from .ircodecs import gapsencoder as gapsenc
 from .ircodecs.bitbytearray import BitByteArray
 
+# Indica si es necesario invertir el orden de bytes de los arrays de enteros
+# (el stream almacena los enteros de 4 bytes en big endian).
+_swap_bytes = sys.byteorder == "little"
+
+# Tamaño de buffer recomendado para lecturas secuenciales de stream (1 MiB).
+SEQUENTIAL_BUFFERING = 1 << 20
+
+# Typecodes de array por tamaño de bloque (en bytes) de la codificación
+# 'ByteBlocks' (lectura y escritura). Otros tamaños se convierten número a
+# número.
+_BLOCK_TYPECODES = {1: "B", 2: "H", 4: "I", 8: "Q"}
+
+# Tamaño (en bytes) a partir del cual el stream se vuelca a disco (5 MiB).
+_AUTOFLUSH_SIZE = 5 << 20
+
+# Long. máxima de las listas cuya evaluación de encoders determinísticos se
+# memoiza, y cantidad máxima de evaluaciones memoizadas.
+_MEMO_MAX_LEN = 16
+_MEMO_SIZE = 2**16
+
+# Encoders de tamaño determinístico (en orden de prioridad) y sus funciones de
+# cómputo de tamaño codificado.
+_DETERMISTIC_ENCODERS = (
+    (EncodeTypes.Unary, unaryenc.compute_encoded_size),
+    (EncodeTypes.Gamma, gammaenc.compute_encoded_size),
+    (EncodeTypes.BitPacking, bpenc.compute_encoded_size),
+    (EncodeTypes.VariableByte, vbenc.compute_encoded_size)
+)
+
+
+def _eval_determistic_encoders(gaps, etypes):
+    '''Retorna el encode determinístico (Unario, Gamma, BitPacking o
+    VariableByte) que genera menor cantidad de bits para la lista dada, junto
+    con dicha cantidad.
+
+    Args:
+        gaps (int list): números a codificar.
+        etypes (list EncodeTypes): lista de encodes a probar.
+
+    Returns:
+        etype (EncodeTypes): encode a utilizar para la lista de nros. dada.
+        size (int): tamaño estimado (en bits) de la lista codificada.
+    '''
+    best_etype, best_size = None, 0
+
+    # Nota: ante igualdad de tamaños, prevalece el primer encode de la tupla.
+    for etype, compute_encoded_size in _DETERMISTIC_ENCODERS:
+        if etype in etypes:
+            size = compute_encoded_size(gaps)
+            if size and (not best_size or size < best_size):
+                best_etype, best_size = etype, size
+
+    return best_etype, best_size
+
+
+# Versión memoizada (los argumentos deben ser hasheables).
+_memo_eval_determistic_encoders = lru_cache(maxsize=_MEMO_SIZE)(
+    _eval_determistic_encoders)
+
+
+def _no_gaps(numbers):
+    '''Encode de gaps nulo: retorna la lista de números dada, sin cambios.'''
+    return numbers
+
+
 
 class IndexStreamReader(object):
     '''Reader de stream binario de índice.'''
 
-    def __init__(self, path):
+    def __init__(self, path, buffering=-1, use_mmap=False, mmap_advice=None):
         '''Inicializa clase.
 
         Args:
             path (string): archivo a leer.
+            buffering (int): tamaño de buffer de lectura (por defecto, el del
+                sistema). Para lecturas secuenciales se recomienda utilizar
+                'SEQUENTIAL_BUFFERING', lo cual reduce la cantidad de llamadas
+                al sistema. Nota: en lecturas aleatorias (con seeks), un buffer
+                grande resulta contraproducente.
+            use_mmap (bool): indica si el archivo se debe mapear en memoria, en
+                cuyo caso las lecturas no requieren llamadas al sistema (y
+                'buffering' no aplica).
+            mmap_advice (int): consejo de acceso al mapeo para el kernel (por
+                ej., mmap.MADV_SEQUENTIAL). Sólo aplica si 'use_mmap' es True
+                y la plataforma soporta 'madvise'.
         '''
         # Puntero de byte en stream actual.
         self.__byte_pointer = 0
@@ -35,8 +118,41 @@ class IndexStreamReader(object):
         # Puntero de bit en último byte del stream.
         self.__bit_pointer = 0
 
-        # Stream.
-        self.__file = open(path, "rb")
+        # Stream. Nota: el objeto mmap expone la misma interfaz de lectura
+        # (read, seek y close) que un archivo.
+        if use_mmap:
+            with open(path, "rb") as file:
+                self.__file = mmap.mmap(file.fileno(), 0,
+                                        access=mmap.ACCESS_READ)
+            if mmap_advice is not None and hasattr(self.__file, "madvise"):
+                self.__file.madvise(mmap_advice)
+        else:
+            self.__file = open(path, "rb", buffering=buffering)
+
+        # Callers de lectura por codificación (evita la cascada de ifs en
+        # cada lectura). Nota: los bloques PFD menores a 64 elementos se
+        # almacenan en VB.
+        self.__read_callers = {
+            EncodeTypes.BitPacking:
+                lambda size, nums, bsize: self.read_binary(size, nums),
+            EncodeTypes.ByteBlocks:
+                lambda size, nums, bsize: self.read_byteblock(size, bsize),
+            EncodeTypes.Unary:
+                lambda size, nums, bsize: self.read_unary(size, nums),
+            EncodeTypes.Gamma:
+                lambda size, nums, bsize: self.read_gamma(size, nums),
+            EncodeTypes.EliasFano:
+                lambda size, nums, bsize: self.read_eliasfano(size, nums),
+            EncodeTypes.Simple16:
+                lambda size, nums, bsize: self.read_simple16(size),
+            EncodeTypes.PForDelta:
+                lambda size, nums, bsize: (self.read_pfd(size, nums)
+                                           if nums >= 64
+                                           else self.read_vb(size))
+        }
+
+        # Caller de lectura por defecto (VByte encode, por descarte).
+        self.__read_vb_caller = lambda size, nums, bsize: self.read_vb(size)
 
     def seek(self, offset):
         '''Establece el puntero de lectura en el byte especificado.
@@ -65,10 +181,12 @@ class IndexStreamReader(object):
         Returns:
             iarray (int list): array de enteros.
         '''
-        iarray = []
-        for i in range(0, len(barray), 4):
-            iarray.append(int.from_bytes(barray[i:i+4], byteorder="big"))
-        return iarray
+        # Conversión en bloque (sin iterar cada 4 bytes).
+        iarray = array("I")
+        iarray.frombytes(barray)
+        if _swap_bytes:
+            iarray.byteswap()
+        return iarray.tolist()
 
     def read_byteblock(self, size, block_size):
         '''Lee la cantidad de bytes especificada y la interpreta como una
@@ -80,12 +198,18 @@ class IndexStreamReader(object):
         '''
         bytes_readed = self.raw_read(size)
 
-        numbers = []
-        for i in range(0, len(bytes_readed), block_size):
-            encoded_number = bytes_readed[i:i+block_size]
-            number = int.from_bytes(encoded_number, byteorder="big")
-            numbers.append(number)
-        return numbers
+        # Conversión en bloque para los tamaños soportados por 'array'.
+        typecode = _BLOCK_TYPECODES.get(block_size)
+        if typecode:
+            numbers = array(typecode)
+            numbers.frombytes(bytes_readed)
+            if _swap_bytes:
+                numbers.byteswap()
+            return numbers.tolist()
+
+        from_bytes = int.from_bytes
+        return [from_bytes(bytes_readed[i:i+block_size], "big")
+                for i in range(0, len(bytes_readed), block_size)]
 
     def read_gamma(self, size, nums):
         '''Lee la cantidad de bytes especificada y la interpreta como una
@@ -196,31 +320,58 @@ class IndexStreamReader(object):
             use_gaps (bool): indica si se debe aplicar decode de gaps. Nota: el
                 parámetro no aplica si la codificación es Elias Fano.
         '''
-        numbers = []
-        if etype == EncodeTypes.BitPacking:
-            numbers = self.read_binary(size, nums)
-        elif etype == EncodeTypes.ByteBlocks:
-            numbers = self.read_byteblock(size, block_size)
-        elif etype == EncodeTypes.Unary:
-            numbers = self.read_unary(size, nums)
-        elif etype == EncodeTypes.Gamma:
-            numbers = self.read_gamma(size, nums)
-        elif etype == EncodeTypes.EliasFano:
-            numbers = self.read_eliasfano(size, nums)
-        elif etype == EncodeTypes.Simple16:
-            numbers = self.read_simple16(size)
-        # Nota: los bloques PFD menores a 64 elementos se almacenan en VB.
-        elif etype == EncodeTypes.PForDelta and nums >= 64:
-            numbers = self.read_pfd(size, nums)
-        # PFD < 64 elementos (o VByte encode, por descarte).
-        else:
-            numbers = self.read_vb(size)
+        caller = self.__read_callers.get(etype, self.__read_vb_caller)
+        numbers = caller(size, nums, block_size)
 
+        # Decode de gaps: suma acumulada en C (vía accumulate), en lugar de
+        # una suma por número a nivel Python.
         if use_gaps and etype != EncodeTypes.EliasFano:
-            numbers = gapsenc.decode(numbers)
+            numbers = list(accumulate(numbers))
 
         return numbers
 
+    def get_read_caller(self, etype, block_size=-1, use_gaps=True):
+        '''Retorna una función de lectura especializada en la codificación
+        dada, equivalente a invocar 'read' con dichos parámetros, pero que
+        evita resolver la codificación en cada lectura.
+
+        Args:
+            etype (EncodeTypes): codificación a utilizar para interpretar las
+                secuencias de bytes leídas.
+            block_size (int): tamaño de bloque para la lectura con codificación
+                de tipo 'ByteBlocks'.
+            use_gaps (bool): indica si se debe aplicar decode de gaps. Nota: el
+                parámetro no aplica si la codificación es Elias Fano.
+
+        Returns:
+            caller (function): función de lectura que recibe la cantidad de
+                bytes a leer y la cantidad de números a decodificar.
+        '''
+        caller = self.__read_callers.get(etype, self.__read_vb_caller)
+
+        if use_gaps and etype != EncodeTypes.EliasFano:
+            return lambda size, nums: list(accumulate(caller(size, nums,
+                                                             block_size)))
+        return lambda size, nums: caller(size, nums, block_size)
+
+    def advise(self, advice, start, length):
+        '''Aconseja al kernel sobre el acceso a un rango del stream (por ej.,
+        mmap.MADV_WILLNEED para su lectura anticipada). Sólo tiene efecto si
+        el stream está mapeado en memoria y la plataforma soporta 'madvise'.
+
+        Args:
+            advice (int): consejo de acceso (constante MADV_* de mmap).
+            start (int): byte inicial del rango.
+            length (int): tamaño (en bytes) del rango.
+        '''
+        if not hasattr(self.__file, "madvise") or start >= len(self.__file):
+            return
+
+        # El inicio del rango debe estar alineado a página.
+        aligned_start = start - start % mmap.PAGESIZE
+        self.__file.madvise(advice, aligned_start,
+                            length + start - aligned_start)
+
     def close(self):
         '''Cierra lectura de stream.'''
         self.__file.close()
@@ -249,32 +400,73 @@ class IndexStreamWriter(object):
         # Flag que indica si hay un bloque abierta en curso.
         self.__block_is_open = False
 
-        # Flag que indica si se deberá aplicar gaps a las escrituras del actual
-        # bloque abierto.
-        self.__use_gaps = False
+        # Caller de encode de gaps de las escrituras del actual bloque abierto.
+        # Se establece al iniciar cada bloque (evita evaluar, en cada
+        # escritura, si se debe aplicar gaps).
+        self.__encode_gaps_caller = _no_gaps
 
-        # Archivo en disco.
-        self.__file = None
+        # Descriptor de archivo en disco (abierto, y truncado, una única vez).
+        # Nota: se escribe directamente sobre el descriptor, ya que los
+        # volcados son de gran tamaño y no se benefician del buffer de un
+        # objeto archivo.
+        flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC
+        flags |= getattr(os, "O_BINARY", 0) | getattr(os, "O_CLOEXEC", 0)
+        self.__fd = os.open(path, flags, 0o644)
 
         # Flag de autoflush.
         self.__auto_flush = auto_flush
 
+        # Callers de escritura por codificación (evita la cascada de ifs en
+        # cada escritura). Cada caller recibe la lista de números original y
+        # el tamaño de bloque, y resuelve por sí mismo si debe aplicar gaps.
+        self.__write_callers = {
+            EncodeTypes.BitPacking:
+                lambda nums, bsize: self.__write_bitpacking(
+                    self.__encode_gaps_caller(nums)),
+            # Escritura en PFOR sólo en caso de que el len a escribir sea
+            # mayor a 64 (esto evita ineficiencias en la compresión).
+            EncodeTypes.PForDelta:
+                lambda nums, bsize: (
+                    self.__write_pfd(self.__encode_gaps_caller(nums))
+                    if len(nums) >= 64
+                    else self.__write_vb(self.__encode_gaps_caller(nums))),
+            EncodeTypes.Simple16:
+                lambda nums, bsize: self.__write_simple16(
+                    self.__encode_gaps_caller(nums)),
+            # Elias Fano: ¡NO GAPS!
+            EncodeTypes.EliasFano:
+                lambda nums, bsize: self.__write_eliasfano(nums),
+            # Encoders 'parameter free'.
+            EncodeTypes.VariableByte:
+                lambda nums, bsize: self.__write_vb(
+                    self.__encode_gaps_caller(nums)),
+            EncodeTypes.ByteBlocks:
+                lambda nums, bsize: self.__write_byteblock(
+                    self.__encode_gaps_caller(nums), bsize),
+            EncodeTypes.Unary:
+                lambda nums, bsize: self.__write_unary(
+                    self.__encode_gaps_caller(nums)),
+            EncodeTypes.Gamma:
+                lambda nums, bsize: self.__write_gamma(
+                    self.__encode_gaps_caller(nums))
+        }
+
     def flush(self):
         '''Realiza volcado a disco del array (y lo vacía).'''
-        if self.__file is None:
-            self.__file = open(self.__path, "wb")
-            self.__file = open(self.__path, "ab")
+        data = memoryview(self.__stream.to_bytearray())
+
+        # Nota: 'os.write' puede realizar escrituras parciales.
+        written = 0
+        while written < len(data):
+            written += os.write(self.__fd, data[written:])
 
-        self.__file.write(self.__stream.to_bytearray())
         self.__stream.clear()
 
     def __verify_autoflush(self):
         '''Realiza volcado a disco del array (y lo vacía) en caso de que supere
         los 5 MiB.'''
-        if self.__auto_flush:
-            mbytes = int((len(self.__stream)/1024)/1024)
-            if mbytes >= 5:
-                self.flush()
+        if self.__auto_flush and len(self.__stream) >= _AUTOFLUSH_SIZE:
+            self.flush()
 
     def tell(self):
         '''Retorna el puntero de escritura y padding del último byte del stream.
@@ -300,7 +492,7 @@ class IndexStreamWriter(object):
 
         # Establecimiento de bloque como abierto.
         self.__block_is_open = True
-        self.__use_gaps = use_gaps
+        self.__encode_gaps_caller = gapsenc.encode if use_gaps else _no_gaps
         return self.__byte_pointer
 
     def __check_if_block_is_open(self):
@@ -338,49 +530,97 @@ class IndexStreamWriter(object):
             iarray (int list): array de enteros.
 
         Returns:
-            barray (byte list): array de bytes.
+            barray (bytes): array de bytes.
         '''
-        barray = []
-        for integer in iarray:
-            barray += integer.to_bytes(4, byteorder="big")
-        return barray
+        # Conversión en bloque (sin generar 4 bytes por entero).
+        barray = array("I", iarray)
+        if _swap_bytes:
+            barray.byteswap()
+        return barray.tobytes()
 
-    def __write_byteblock(self, number, block_size):
-        '''Escribe el número dado utilizando bloques fijos de octetos.
+    def __write_byteblock(self, numbers, block_size):
+        '''Escribe la lista de números dada utilizando bloques fijos de bytes.
 
         Args:
-            numbers (int): número a escribir.
+            numbers (int list): números a escribir.
             block_size (int): tamaño de bytes por número.
         '''
-        bytes_to_write = number.to_bytes(block_size, byteorder="big")
-        self.raw_write(bytes_to_write, 0)
+        # Codificación en bloque: los números se convierten en un único buffer,
+        # que se agrega al stream en una sola escritura (al ser bytes
+        # completos, equivale a agregarlos de a uno).
+        typecode = _BLOCK_TYPECODES.get(block_size)
+        if typecode:
+            encoded = array(typecode, numbers)
+            if _swap_bytes:
+                encoded.byteswap()
+            bytes_to_write = encoded.tobytes()
+        else:
+            bytes_to_write = b"".join([number.to_bytes(block_size, "big")
+                                       for number in numbers])
+
+        self.__stream.extend(bytes_to_write, 0)
+        self.__byte_pointer += len(bytes_to_write)
 
-    def __write_gamma(self, number):
-        '''Escribe el número dado utilizando Gamma.
+    def __write_bitwise(self, numbers, encode):
+        '''Escribe la lista de números dada utilizando el encoder de números
+        especificado, cuya salida no necesariamente se encuentra alineada a
+        byte. Equivale a invocar 'raw_write' por cada número.
 
         Args:
-            number (int): número a escribir.
+            numbers (int list): números a escribir.
+            encode (function): encoder que, dado un número, retorna los bytes
+                codificados y el relleno (en bits) del último byte.
         '''
-        bytes_to_write, padding = gammaenc.encode(number)
-        self.raw_write(bytes_to_write, padding)
+        stream = self.__stream
+        extend = stream.extend
+        get_padding = stream.padding
+        byte_pointer = self.__byte_pointer
 
-    def __write_unary(self, number):
-        '''Escribe el número dado utilizando Unario.
+        for number in numbers:
+            bytes_to_write, padding = encode(number)
+            old_padding = get_padding()
+            extend(bytes_to_write, padding)
+
+            # Ver 'raw_write': se escribe 1 byte 'menos' si la carga útil del
+            # número cabe en el último byte del stream.
+            byte_pointer += len(bytes_to_write)
+            if old_padding + padding >= 8:
+                byte_pointer -= 1
+
+        self.__byte_pointer = byte_pointer
+
+    def __write_gamma(self, numbers):
+        '''Escribe la lista de números dada utilizando Gamma.
 
         Args:
-            number (int): número a escribir.
+            numbers (int list): números a escribir.
         '''
-        bytes_to_write, padding = unaryenc.encode(number, optimize=True)
-        self.raw_write(bytes_to_write, padding)
+        self.__write_bitwise(numbers, gammaenc.encode)
+
+    def __write_unary(self, numbers):
+        '''Escribe la lista de números dada utilizando Unario.
+
+        Args:
+            numbers (int list): números a escribir.
+        '''
+        encode = unaryenc.encode
+        self.__write_bitwise(numbers, lambda n: encode(n, optimize=True))
 
-    def __write_vb(self, number):
-        '''Escribe el número dado utilizando Variable Byte.
+    def __write_vb(self, numbers):
+        '''Escribe la lista de números dada utilizando Variable Byte.
 
         Args:
-            number (int): número a escribir.
+            numbers (int list): números a escribir.
         '''
-        bytes_to_write = vbenc.encode(number)
-        self.raw_write(bytes_to_write)
+        # Nota: escritura en bloque (ver '__write_byteblock').
+        bytes_to_write = bytearray()
+        extend = bytes_to_write.extend
+        encode = vbenc.encode
+        for number in numbers:
+            extend(encode(number))
+
+        self.__stream.extend(bytes_to_write, 0)
+        self.__byte_pointer += len(bytes_to_write)
 
     def __write_bitpacking(self, numbers):
         '''Escribe la lista de números dada utilizando Bit Packing.
@@ -434,19 +674,16 @@ class IndexStreamWriter(object):
         # Escritura de bytes.
         self.__stream.extend(bytes_to_write, padding)
 
-        # Offset de bit anterior a la escritura.
-        old_bit_index = 8-old_padding-1
-
-        # Indica si se han escrito todos los bytes, ya que puede suceder que se
-        # escriba 1 byte 'menos' si la diferencia entre el bit pointer antes de
-        # la escritura y el padding del elemento agregado es menor a 0. Ej.:
-        # si se requiere escribir un byte con padding 7 (por tanto, con carga
-        # útil de 1 bit) y si el bit pointer actual es 1, entonces se escribe
-        # la carga útil (1 bit) en ese byte, pero no se agrega uno nuevo.
-        all_bytes_writed = (old_bit_index - padding) >= 0
-
-        # Incremento de bit pointer (menos 1 byte, si así fuera necesario).
-        self.__byte_pointer += len(bytes_to_write)-int(not(all_bytes_writed))
+        # Incremento de byte pointer. Puede suceder que se escriba 1 byte
+        # 'menos' si la suma del padding anterior a la escritura y el padding
+        # del elemento agregado es de al menos 8 bits (es decir, si la carga
+        # útil del último byte cabe en el último byte del stream). Ej.: si se
+        # requiere escribir un byte con padding 7 (por tanto, con carga útil
+        # de 1 bit) y si el bit pointer actual es 1, entonces se escribe la
+        # carga útil (1 bit) en ese byte, pero no se agrega uno nuevo.
+        self.__byte_pointer += len(bytes_to_write)
+        if old_padding + padding >= 8:
+            self.__byte_pointer -= 1
 
     def write(self, numbers, etype, block_size=-1):
         '''Escribe, en el stream, la lista de números especificada, con el tipo
@@ -460,90 +697,61 @@ class IndexStreamWriter(object):
         '''
         self.__check_if_block_is_open()
 
-        # Gaps de numbers (si corresponde).
-        gaps = gapsenc.encode(numbers) if self.__use_gaps else numbers
+        caller = self.__write_callers.get(etype)
+        if caller is not None:
+            caller(numbers, block_size)
 
-        if etype == EncodeTypes.BitPacking:
-            self.__write_bitpacking(gaps)
-        if etype == EncodeTypes.PForDelta:
-            # Escritura en PFOR sólo en caso de que el len a escribir sea mayor
-            # a 64 (esto evita ineficiencias en la compresión).
-            if len(numbers) >= 64:
-                self.__write_pfd(gaps)
-            else:
-                for gap in gaps:
-                    self.__write_vb(gap)
-        elif etype == EncodeTypes.Simple16:
-            self.__write_simple16(gaps)
-        # Elias Fano: ¡NO GAPS!
-        elif etype == EncodeTypes.EliasFano:
-            self.__write_eliasfano(numbers)
-        else:
-            # Encoders 'parameter free'.
-            if etype == EncodeTypes.VariableByte:
-                for gap in gaps:
-                    self.__write_vb(gap)
-            elif etype == EncodeTypes.ByteBlocks:
-                for gap in gaps:
-                    self.__write_byteblock(gap, block_size)
-            elif etype == EncodeTypes.Unary:
-                for gap in gaps:
-                    self.__write_unary(gap)
-            elif etype == EncodeTypes.Gamma:
-                for gap in gaps:
-                    self.__write_gamma(gap)
-
-    def __eval_determistic_encoders(self, numbers, etypes):
+    def __eval_determistic_encoders(self, gaps, etypes):
         '''Retorna el encode que genera menor cantidad de bits para la lista de
         nros. dada. El tamaño no se computa realizando la codificación (lo cual
         sería costoso), sino que según las ecuaciones determinísticas de los
         métodos de compresión Unario, Gamma, BitPacking y VariableByte.
 
         Args:
-            numbers (int list): números a codificar.
+            gaps (int list): números a codificar (con gaps ya aplicados, si
+                corresponde).
             etypes (list EncodeTypes): lista de encodes a probar.
 
         Returns:
             etype (EncodeTypes): encode a utilizar para la lista de nros. dada.
         '''
-        gaps = gapsenc.encode(numbers) if self.__use_gaps else numbers
-        unary_size = 0  # Unario
-        gamma_size = 0  # Gamma
-        bp_size = 0     # Bit packing
-        vb_size = 0     # Variable Byte
-
-        if EncodeTypes.Unary in etypes:
-            unary_size = unaryenc.compute_encoded_size(gaps)
-
-        if EncodeTypes.Gamma in etypes:
-            gamma_size = gammaenc.compute_encoded_size(gaps)
+        # Las listas cortas (p. ej., de frecuencias) se repiten entre términos,
+        # por lo que su evaluación se memoiza.
+        if len(gaps) <= _MEMO_MAX_LEN:
+            return _memo_eval_determistic_encoders(tuple(gaps), tuple(etypes))
+        return _eval_determistic_encoders(gaps, etypes)
 
-        if EncodeTypes.BitPacking in etypes:
-            bp_size = bpenc.compute_encoded_size(gaps)
+    def __determistic_encode(self, gaps, etype):
+        '''Codifica la lista de nros. dada con el encoder determinístico
+        especificado (Unario, Gamma, BitPacking o VariableByte).
 
-        if EncodeTypes.VariableByte in etypes:
-            vb_size = vbenc.compute_encoded_size(gaps)
-
-        encoded_sizes = [unary_size, gamma_size, bp_size, vb_size]
+        Args:
+            gaps (int list): números a codificar (con gaps ya aplicados, si
+                corresponde).
+            etype (EncodeTypes): encode a utilizar.
 
-        # Mínimo, excluyendo valores ceros.
-        min_size = min([x for x in encoded_sizes if x != 0])
+        Returns:
+            encoded (bytes): lista codificada.
+            padding (int): relleno (en bits) del último byte.
+        '''
+        if etype == EncodeTypes.BitPacking:
+            return bpenc.encode(gaps)
 
-        for i in range(0, len(encoded_sizes)):
-            size = encoded_sizes[i]
+        bbarray = BitByteArray()
+        if etype == EncodeTypes.Unary:
+            for gap in gaps:
+                encoded, padding = unaryenc.encode(gap, optimize=True)
+                bbarray.extend(encoded, padding)
+        elif etype == EncodeTypes.Gamma:
+            for gap in gaps:
+                encoded, padding = gammaenc.encode(gap)
+                bbarray.extend(encoded, padding)
+        elif etype == EncodeTypes.VariableByte:
+            for gap in gaps:
+                encoded = vbenc.encode(gap)
+                bbarray.extend(encoded, 0)
 
-            if size == 0:
-                continue
-            elif min_size == size:
-                # Índices mapeables con el orden de la lista 'encoded_sizes'.
-                if i == 0:
-                    return EncodeTypes.Unary, min_size
-                elif i == 1:
-                    return EncodeTypes.Gamma, min_size
-                elif i == 2:
-                    return EncodeTypes.BitPacking, min_size
-                elif i == 3:
-                    return EncodeTypes.VariableByte, min_size
+        return bbarray.to_bytearray(), bbarray.padding()
 
     def multiencode_write(self, numbers, etypes):
         '''Escribe la lista de números dada con el encode que genere la menor
@@ -565,7 +773,8 @@ class IndexStreamWriter(object):
         bpadding = 0     # Best padding.
         bsize = None     # Best size.
 
-        gaps = gapsenc.encode(numbers) if self.__use_gaps else numbers
+        # Gaps de numbers (calculados una única vez para todos los tests).
+        gaps = self.__encode_gaps_caller(numbers)
 
         # 1. PFOR test (sólo en caso de que lista de nums sea >= 64).
         if EncodeTypes.PForDelta in etypes and len(numbers) >= 64:
@@ -580,32 +789,14 @@ class IndexStreamWriter(object):
                 bencoded, bencoder = s16encoded, EncodeTypes.Simple16
                 bsize = len(s16encoded)*8
 
-        # 3. Deterministic (estimated) size encoders test.
-        eencoder, esize = self.__eval_determistic_encoders(numbers, etypes)
-        if not bsize or esize < bsize:
-            bencoder = eencoder
+        # 3. Deterministic (estimated) size encoders test. Nota: la
+        # codificación se difiere hasta conocer el resultado del test de EF,
+        # evitando codificar una lista que luego es descartada.
+        eencoder, esize = self.__eval_determistic_encoders(gaps, etypes)
+        if eencoder is not None and (not bsize or esize < bsize):
+            bencoded, bencoder = None, eencoder
             bsize = esize
 
-            bbarray = BitByteArray()
-            if bencoder == EncodeTypes.BitPacking:
-                bencoded, bpadding = bpenc.encode(gaps)
-            else:
-                if bencoder == EncodeTypes.Unary:
-                    for gap in gaps:
-                        encoded, padding = unaryenc.encode(gap, optimize=True)
-                        bbarray.extend(encoded, padding)
-                elif bencoder == EncodeTypes.Gamma:
-                    for gap in gaps:
-                        encoded, padding = gammaenc.encode(gap)
-                        bbarray.extend(encoded, padding)
-                elif bencoder == EncodeTypes.VariableByte:
-                    for gap in gaps:
-                        encoded = vbenc.encode(gap)
-                        bbarray.extend(encoded, 0)
-
-                bencoded = bbarray.to_bytearray()
-                bpadding = bbarray.padding()
-
         # 4. EF Test. Nota: se evalua por último para evitar prioridad sobre
         # VByte, ya que EF utiliza dicho encode para las secuencias de long. 1.
         if EncodeTypes.EliasFano in etypes:
@@ -615,12 +806,16 @@ class IndexStreamWriter(object):
                 bencoded, bencoder = encoded, EncodeTypes.EliasFano
                 bpadding = padding
 
+        # Codificación de lista con encoder determinístico (si fue el mejor).
+        if bencoded is None:
+            bencoded, bpadding = self.__determistic_encode(gaps, bencoder)
+
         # Raw write y return de best encoded.
         self.raw_write(bencoded, bpadding)
         return bencoder
 
     def close(self):
         '''Cierra lectura de stream.'''
-        self.__file.close()
+        os.close(self.__fd)
         self.__stream.clear()
         self.__byte_pointer = 0
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+'''
+- Nombre: encoderstats.py
+- Descripción: contiene las funciones que permiten escribir y leer los
+archivos de estadísticas de codificación automática (multiencode). Se
+admiten dos formatos: texto plano (una lista invertida por línea) y binario.
+En este último, cada registro se compone de: long. de término (2 bytes),
+término (utf-8), codificación (1 byte), long. de lista (4 bytes) y lista de
+números (8 bytes con signo por número para docs y 4 bytes sin signo para
+freqs), todos los enteros en little endian.
+- Autor: Agustín González
+- Modificado: 15/10/26
+'''
+
+import re
+import sys
+import ast
+import json
+import struct
+from array import array
+
+from lib.index.compression.ircodecs import EncodeTypes
+
+# Extensión de archivos de estadísticas binarios.
+BINARY_EXTENSION = ".bin"
+
+# Typecodes de los números de los registros binarios. Los docs son enteros de
+# 64 bits con signo (los DOCNOs de TREC pueden superar los 32 bits, y el id es
+# -1 antes del primer documento), mientras que las freqs son enteros de 32
+# bits sin signo.
+DOCS_TYPECODE = "q"
+FREQS_TYPECODE = "I"
+
+# Estructuras de encabezado de registro binario.
+_term_header = struct.Struct("<H")
+_posting_header = struct.Struct("<BI")
+
+# Regex de registro de texto: permite extraer término, codificación y lista de
+# números en una única pasada por línea.
+_text_record = re.compile(r"Term:\s*(.*?)\s*;\s*EncodeType:\s*(.*?)\s*;"
+                          r"\s*Numbers:\s*(.*?)\s*$")
+
+# Indica si es necesario invertir el orden de bytes de los arrays de números
+# (el formato binario se almacena en little endian).
+_swap_bytes = sys.byteorder != "little"
+
+
+def write_text_record(writer, term, etype, numbers, typecode=None):
+    '''Escribe un registro de estadísticas en formato texto.
+
+    Args:
+        writer (file): archivo de salida (modo texto).
+        term (string): término al que corresponde la lista de números.
+        etype (EncodeTypes): codificación utilizada.
+        numbers (int list): números escritos con la codificación dada.
+        typecode (string): no utilizado (el texto no tiene límite de tamaño
+            de número); se admite por compatibilidad con el formato binario.
+    '''
+    data = "Term: " + term + "; "
+    data += "EncodeType: " + str(etype.name) + "; "
+    data += "Numbers: " + str(numbers) + "\n"
+    writer.write(data)
+
+
+def write_binary_record(writer, term, etype, numbers, typecode):
+    '''Escribe un registro de estadísticas en formato binario.
+
+    Args:
+        writer (file): archivo de salida (modo binario).
+        term (string): término al que corresponde la lista de números.
+        etype (EncodeTypes): codificación utilizada.
+        numbers (int list): números escritos con la codificación dada.
+        typecode (string): typecode de los números ('DOCS_TYPECODE' o
+            'FREQS_TYPECODE').
+    '''
+    bterm = term.encode("utf-8")
+    bnumbers = array(typecode, numbers)
+    if _swap_bytes:
+        bnumbers.byteswap()
+
+    writer.write(_term_header.pack(len(bterm)))
+    writer.write(bterm)
+    writer.write(_posting_header.pack(etype.value, len(bnumbers)))
+    writer.write(bnumbers.tobytes())
+
+
+def _read_text_records(path, buffering):
+    '''Generador de registros de un archivo de estadísticas de texto.'''
+    with open(path, buffering=buffering) as reader:
+        for line in reader:
+            term, encode, posting = _text_record.match(line).groups()
+
+            # Parseo de posting: JSON es considerablemente más rápido que el
+            # literal eval, que se mantiene como alternativa ante otros
+            # formatos.
+            try:
+                posting = json.loads(posting)
+            except ValueError:
+                posting = ast.literal_eval(posting)
+
+            yield term, encode, posting
+
+
+def _read_binary_records(path, typecode, buffering):
+    '''Generador de registros de un archivo de estadísticas binario.'''
+    term_size = _term_header.size
+    posting_size = _posting_header.size
+
+    with open(path, "rb", buffering=buffering) as reader:
+        while True:
+            raw = reader.read(term_size)
+            if not raw:
+                break
+
+            term = reader.read(_term_header.unpack(raw)[0]).decode("utf-8")
+            raw = reader.read(posting_size)
+            etype, nums = _posting_header.unpack(raw)
+
+            posting = array(typecode)
+            posting.frombytes(reader.read(nums * posting.itemsize))
+            if _swap_bytes:
+                posting.byteswap()
+
+            # Nota: se retorna el array tipado (y no una lista), lo que evita
+            # materializar un objeto int por número hasta que sea necesario.
+            yield term, EncodeTypes(etype).name, posting
+
+
+def read_records(path, typecode, buffering=-1):
+    '''Retorna un generador de los registros del archivo de estadísticas dado.
+    El formato se determina según la extensión del archivo.
+
+    Args:
+        path (string): archivo de estadísticas.
+        typecode (string): typecode de los números de los registros binarios
+            ('DOCS_TYPECODE' o 'FREQS_TYPECODE'; debe coincidir con el
+            utilizado en la escritura).
+        buffering (int): tamaño de buffer de lectura.
+
+    Returns:
+        records (generator): registros (término, nombre de codificación y
+            lista de números). En formato binario, la lista de números es un
+            array del typecode dado.
+    '''
+    if path.endswith(BINARY_EXTENSION):
+        return _read_binary_records(path, typecode, buffering)
+    return _read_text_records(path, buffering)
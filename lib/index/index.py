@@ -5,50 +5,81 @@
 - Descripción: contiene las clases 'ChunkInfo', 'PostingPointer' e 'Index',
 que permiten gestionar un corpus indexado.
 - Autor: Agustín González
-- Modificado: 18/04/18
+- Modificado: 15/10/26
 '''
 
 import os
 import gc
-import math
+import mmap
 from array import array
+from itertools import chain, count, repeat
+from operator import itemgetter
 
 from lib.index.compression.ircodecs import EncodeTypes
 from lib.index.compression.ircodecs import vbencoder as vbenc
 from lib.index.compression.indexstream import IndexStreamReader
 
+# Tabla de encodes indexada por valor de nibble (4 bits), utilizada para
+# descomprimir los tipos de codificación de chunks. Los valores que no
+# corresponden a ningún encode se mapean a None.
+_ETYPES_BY_NIBBLE = tuple({e.value: e for e in EncodeTypes}.get(i)
+                          for i in range(16))
+
+# Tablas de encodes de docs y freqs indexadas por byte de encodes comprimidos
+# (nibble alto y bajo, respectivamente).
+_DOCS_ETYPES_BY_BYTE = tuple(_ETYPES_BY_NIBBLE[i >> 4] for i in range(256))
+_FREQS_ETYPES_BY_BYTE = tuple(_ETYPES_BY_NIBBLE[i & 0xF] for i in range(256))
+
+# Getters de columnas de chunks info crudos.
+_first = itemgetter(0)
+_second = itemgetter(1)
+_third = itemgetter(2)
+
 
 class ChunkInfo(object):
     '''Información de chunk (partición) de posting list de término.'''
 
-    def __init__(self, number=0):
+    # Nota: el uso de slots evita el dict de atributos por instancia (de
+    # relevancia al mantener la info de chunks en memoria).
+    __slots__ = ("number", "chunk_size", "docs_encode", "docs_size",
+                 "freqs_encode", "freqs_size")
+
+    def __init__(self, number=0, chunk_size=0, docs_encode=None, docs_size=0,
+                 freqs_encode=None, freqs_size=0):
         '''Inicializa información de chunk de posting.
 
         Args:
             number (int): número de chunk info. De utilidad para identificación
                  dentro de la lista de chunks de la clase 'PostingPointer'.
+            chunk_size (int): tamaño de chunk.
+            docs_encode (EncodeTypes): encode de documentos.
+            docs_size (int): tamaño en bytes del bloque de docs.
+            freqs_encode (EncodeTypes): encode de freqs.
+            freqs_size (int): tamaño en bytes del bloque de freqs.
         '''
         self.number = number
 
         # Tamaño de chunk.
-        self.chunk_size = 0
+        self.chunk_size = chunk_size
 
         # Encode de documento (EncodeTypes).
-        self.docs_encode = None
+        self.docs_encode = docs_encode
 
         # Tamaño en bytes del bloque de docs.
-        self.docs_size = 0
+        self.docs_size = docs_size
 
         # Encode de freqs (EncodeTypes).
-        self.freqs_encode = None
+        self.freqs_encode = freqs_encode
 
         # Tamaño en bytes del bloque de freqs.
-        self.freqs_size = 0
+        self.freqs_size = freqs_size
 
 
 class PostingPointer(object):
     '''Puntero a posting list.'''
 
+    __slots__ = ("term_id", "posting_start", "posting_count", "chunks_info")
+
     def __init__(self, term_id, posting_start, posting_count):
         '''Inicializa puntero.
 
@@ -71,13 +102,14 @@ class PostingPointer(object):
         Args:
             chunks_info (ChunkInfo list): información de chunks de postings.
         '''
-        # Validación
-        numbers = [p.number for p in chunks_info]
+        # Validación (omitida al ejecutar con 'python -O').
+        if __debug__:
+            numbers = {p.number for p in chunks_info}
 
-        ex = "No pueden existir dos números de chunk info iguales."
-        # Si el len es distinto, hay al menos dos números repetidos.
-        if len(set(numbers)) != len(numbers):
-            raise Exception(ex)
+            ex = "No pueden existir dos números de chunk info iguales."
+            # Si el len es distinto, hay al menos dos números repetidos.
+            if len(numbers) != len(chunks_info):
+                raise Exception(ex)
 
         # Sort y add.
         chunks_info.sort(key=lambda x: x.number)
@@ -93,6 +125,9 @@ class Index(object):
         Args:
             dirindex (string): directorio de índice.
         '''
+        # Directorio de índice.
+        self.dirindex = dirindex
+
         # Path de colección.
         self.collection_path = dirindex + "/collection.txt"
 
@@ -128,9 +163,9 @@ class Index(object):
         self.__doc_encode = 0
         self.__freq_encode = 0
 
-        # Caller de parser de chunk info. Su valor dependerá de si el índice es
-        # o no multiencode.
-        self.__parse_raw_chunk_info_caller = None
+        # Caller de parser de chunks info. Su valor dependerá de si el índice
+        # es o no multiencode.
+        self.__parse_raw_chunks_info_caller = None
 
         # Caller que permite computar los tamaños de chunks del índice.
         self.__compute_chunk_sizes_caller = None
@@ -138,6 +173,15 @@ class Index(object):
         # Caller de get de chunks info.
         self.__get_raw_chunks_info_caller = None
 
+        # Caller de get de posting lists (docs y freqs). Su valor dependerá de
+        # si el índice es o no multiencode.
+        self.__get_posting_lists_caller = None
+
+        # Readers de postings y de info de chunks, reutilizados entre queries
+        # (creados al primer uso y liberados en 'close()').
+        self.__postings_reader = None
+        self.__chunksinfo_reader = None
+
     def exists(self):
         '''Verifica si existe el índice.
 
@@ -160,6 +204,17 @@ class Index(object):
         self.__check_load()
         return self.__multiencode
 
+    def get_encodes(self):
+        '''Retorna las codificaciones de docs y freqs del índice (sólo en
+        caso de que éste sea monoencode).
+
+        Returns:
+            doc_encode (EncodeTypes): codificación de bloques de docs.
+            freq_encode (EncodeTypes): codificación de bloques de freqs.
+        '''
+        self.__check_load()
+        return self.__doc_encode, self.__freq_encode
+
     def get_chunks_info_in_memory_count(self):
         '''Retorna la cantidad de chunks en memoria.
 
@@ -211,54 +266,52 @@ class Index(object):
 
         fcollection.close()
 
-    def __parse_raw_multiencode_chunk_info(self, to_parse, chunk_size, number=0):
-        '''Parsea una lista de 4 enteros (chunk info 'crudo') a un obj. de tipo
-        'ChunkInfo'.
+    def __parse_raw_multiencode_chunks_info(self, raw_chunks_info,
+                                            chunk_sizes):
+        '''Parsea una lista de chunks info 'crudos' (listas de 3 enteros) a
+        una lista de objs. de tipo 'ChunkInfo'.
 
         Args:
-            number (int): número de chunk info.
-            chunk_size (int): tamaño de chunk.
-            to_parse (int list): puntero a parsear. Contiene, en el siguiente
-                orden: encode types, docs size y freqs size.
+            raw_chunks_info (list array int): chunks info a parsear. Cada uno
+                contiene, en el siguiente orden: encode types, docs size y
+                freqs size.
+            chunk_sizes (int list): tamaño de cada uno de los chunks.
 
         Returns:
-            chunk_info(ChunkInfo): información de chunks parseada.
+            chunks_info (ChunkInfo list): información de chunks parseada,
+                numerada a partir de 1.
         '''
-        chunk_info = ChunkInfo(number)
-        chunk_info.chunk_size = chunk_size
-        chunk_info.docs_size = to_parse[1]
-        chunk_info.freqs_size = to_parse[2]
-
-        # Descompresión de encode_types
-        etypes = self.__parse_compressed_etypes(to_parse[0])
-        chunk_info.docs_encode = EncodeTypes(etypes[0])
-        chunk_info.freqs_encode = EncodeTypes(etypes[1])
-
-        return chunk_info
-
-    def __parse_raw_monoencode_chunk_info(self, to_parse, chunk_size, number=0):
-        '''Parsea una lista de 3 enteros (chunk info 'crudo') a un obj. de tipo
-        'ChunkInfo'.
+        # Nota: el parseo se resuelve con map (iteración en C) sobre columnas
+        # de los chunks crudos, sin ciclo a nivel intérprete. Los encodes se
+        # obtienen desde tablas indexadas por el byte comprimido.
+        etypes = list(map(_first, raw_chunks_info))
+        return list(map(ChunkInfo, count(1), chunk_sizes,
+                        map(_DOCS_ETYPES_BY_BYTE.__getitem__, etypes),
+                        map(_second, raw_chunks_info),
+                        map(_FREQS_ETYPES_BY_BYTE.__getitem__, etypes),
+                        map(_third, raw_chunks_info)))
+
+    def __parse_raw_monoencode_chunks_info(self, raw_chunks_info,
+                                           chunk_sizes):
+        '''Parsea una lista de chunks info 'crudos' (listas de 2 enteros) a
+        una lista de objs. de tipo 'ChunkInfo'.
 
         Args:
-            number (int): número de chunk info.
-            chunk_size (int): tamaño de chunk.
-            to_parse (int list): puntero a parsear. Contiene, en el siguiente
-                orden: docs size y freqs size.
+            raw_chunks_info (list array int): chunks info a parsear. Cada uno
+                contiene, en el siguiente orden: docs size y freqs size.
+            chunk_sizes (int list): tamaño de cada uno de los chunks.
 
         Returns:
-            chunk_info(ChunkInfo): información de chunks parseada.
+            chunks_info (ChunkInfo list): información de chunks parseada,
+                numerada a partir de 1.
         '''
-        chunk_info = ChunkInfo(number)
-        chunk_info.chunk_size = chunk_size
-        chunk_info.docs_size = to_parse[0]
-        chunk_info.freqs_size = to_parse[1]
-
-        # Información de tipos de encodes utilizados.
-        chunk_info.docs_encode = self.__doc_encode
-        chunk_info.freqs_encode = self.__freq_encode
-
-        return chunk_info
+        # Nota: ídem multiencode, el parseo se resuelve con map (los encodes
+        # son los mismos para todos los chunks).
+        return list(map(ChunkInfo, count(1), chunk_sizes,
+                        repeat(self.__doc_encode),
+                        map(_first, raw_chunks_info),
+                        repeat(self.__freq_encode),
+                        map(_second, raw_chunks_info)))
 
     def __get_raw_multiencode_chunks_info(self, reader, size):
         '''Obtiene una lista de chunks info donde cada elemento es un array de
@@ -281,32 +334,27 @@ class Index(object):
         pstart, offset = vbenc.decode_number(raw)
         pcount, offset = vbenc.decode_number(raw, offset)
 
-        # Decodificación de raw.
+        # Decodificación de raw. Nota: el decoder y el tamaño de raw se
+        # resuelven fuera del ciclo, y los dos números VB de cada chunk se
+        # decodifican sin ciclo interno.
+        decode_number = vbenc.decode_number
+        raw_len = len(raw)
         raw_index = offset >> 3  # offset/8
-        decoded_raw = []
-        while raw_index < len(raw):
+        raw_chunks_info = []
+        append = raw_chunks_info.append
+        while raw_index < raw_len:
             # Encode types
-            decoded_raw += [raw[raw_index]]
-            offset += 8
+            etypes = raw[raw_index]
 
             # 2, 3: {docs_size, freqs_size}
-            for _ in range(0, 2):
-                returned = vbenc.decode_number(raw, offset)
-                decoded_raw += [returned[0]]
-                offset = returned[1]
-            raw_index = offset >> 3  # int(offset/8)
+            docs_size, offset = decode_number(raw, offset + 8)
+            freqs_size, offset = decode_number(raw, offset)
 
-        raw_chunks_info = []
-        for i in range(0, len(decoded_raw), 3):
-            etypes = decoded_raw[i]
-            docs_size = decoded_raw[i+1]
-            freqs_size = decoded_raw[i+2]
+            # Array de ints de máximo 31 bits por elemento (construido en
+            # forma directa, sin lista intermedia de números decodificados).
+            append(array('i', (etypes, docs_size, freqs_size)))
 
-            # Array de ints de máximo 31 bits por elemento.
-            chunk_info = array('i')
-            chunk_info.extend([etypes, docs_size, freqs_size])
-
-            raw_chunks_info.append(chunk_info)
+            raw_index = offset >> 3  # int(offset/8)
 
         return pstart, pcount, raw_chunks_info
 
@@ -326,22 +374,13 @@ class Index(object):
         '''
         raw = reader.read(size, etype=EncodeTypes.VariableByte, use_gaps=False)
 
-        # Extracción de posting start.
-        pstart = raw.pop(0)
-
-        # Decodificación de cantidad de elementos de posting.
-        pcount = raw.pop(0)
-
-        raw_chunks_info = []
+        # Extracción de posting start y cantidad de elementos de posting (sin
+        # 'pop(0)', que desplaza la lista completa).
+        pstart = raw[0]
+        pcount = raw[1]
 
-        for i in range(0, len(raw), 2):
-            docs_size = raw[i]
-            freqs_size = raw[i+1]
-
-            chunk_info = array('i')
-            chunk_info.extend([docs_size, freqs_size])
-
-            raw_chunks_info.append(chunk_info)
+        raw_chunks_info = [array('i', raw[i:i+2])
+                           for i in range(2, len(raw), 2)]
 
         return pstart, pcount, raw_chunks_info
 
@@ -355,10 +394,9 @@ class Index(object):
             doc_encode (EncodeTypes): codificación de bloques de docs.
             freq_encode (EncodeTypes): codificación de bloques de freqs.
         '''
-        doc_encode = EncodeTypes((etypes & 0b11110000) >> 4)
-        freq_encode = EncodeTypes(etypes & 0b0001111)
-
-        return doc_encode, freq_encode
+        # Nota: se indexa la tabla de encodes en lugar de construir el enum
+        # (cuya búsqueda por valor es considerablemente más costosa).
+        return _ETYPES_BY_NIBBLE[etypes >> 4], _ETYPES_BY_NIBBLE[etypes & 0xF]
 
     def __load_index_data(self, reader):
         '''Carga el tamaño de chunk, doc y freq encode del índice, asignando
@@ -377,18 +415,18 @@ class Index(object):
         etypes = reader.read(1, etype=etype, block_size=1)[0]
 
         # Nota: la asignación de callers permite evitar branchs ifs.
-        # 1. Asignación de caller de parser de información de chunk.
+        # 1. Asignación de caller de parser de información de chunks.
         self.__multiencode = True
-        caller = self.__parse_raw_multiencode_chunk_info
+        caller = self.__parse_raw_multiencode_chunks_info
 
         # Si los tipos de encode están definidos en el encabezado...
         if etypes:
             self.__multiencode = False
             returned = self.__parse_compressed_etypes(etypes)
             self.__doc_encode, self.__freq_encode = returned
-            caller = self.__parse_raw_monoencode_chunk_info
+            caller = self.__parse_raw_monoencode_chunks_info
 
-        self.__parse_raw_chunk_info_caller = caller
+        self.__parse_raw_chunks_info_caller = caller
 
         # 2. Asignación de caller de getter de chunk info.
         caller = self.__get_raw_monoencode_chunks_info
@@ -397,7 +435,14 @@ class Index(object):
 
         self.__get_raw_chunks_info_caller = caller
 
-        # 3. Asignación de caller para computar los tamaños de chunks.
+        # 3. Asignación de caller de getter de posting lists.
+        caller = self.__get_monoencode_posting_lists
+        if self.__multiencode:
+            caller = self.__get_multiencode_posting_lists
+
+        self.__get_posting_lists_caller = caller
+
+        # 4. Asignación de caller para computar los tamaños de chunks.
         caller = self.__compute_chunk_size_if_not_chunks
         if self.__chunk_size != 0:
             caller = self.__compute_chunk_sizes_if_chunks
@@ -426,17 +471,18 @@ class Index(object):
             posting_count (int): cantidad de elementos de la posting list.
 
         Returns:
-            chunk_sizes (int): tamaños de cada uno de los chunks de la posting.
+            chunk_sizes (int iterator): tamaños de cada uno de los chunks de la
+                posting. Nota: se retorna un iterador (y no una lista), lo cual
+                evita reservar memoria por cada posting.
         '''
         csize = self.__chunk_size
-        chunk_sizes = [csize] * math.ceil(posting_count/csize)
+        chunks, mod = divmod(posting_count, csize)
 
-        # Si posting count no es divisible por chunk size...
-        mod = posting_count % csize
+        # Si posting count no es divisible por chunk size, el último chunk
+        # tiene tamaño 'mod'.
         if mod:
-            chunk_sizes[-1] = mod
-
-        return chunk_sizes
+            return chain(repeat(csize, chunks), (mod,))
+        return repeat(csize, chunks)
 
     def __load_vocabulary(self):
         '''Carga vocabulario en memoria.'''
@@ -445,34 +491,55 @@ class Index(object):
 
         fvocabulary = open(self.vocabulary_path)
 
-        # Reader secuencial.
-        reader = IndexStreamReader(self.chunksinfo_path)
-
-        # Carga de encodes y chunk size de índice.
-        self.__load_index_data(reader)
+        # Reader secuencial. Si la información de chunks se carga en memoria,
+        # el archivo se recorre completo, por lo que se mapea en memoria (con
+        # lectura anticipada por parte del kernel).
+        if self.__chunks_info_in_memory:
+            advice = getattr(mmap, "MADV_SEQUENTIAL", None)
+            reader = IndexStreamReader(self.chunksinfo_path, use_mmap=True,
+                                       mmap_advice=advice)
+        else:
+            reader = IndexStreamReader(self.chunksinfo_path)
 
-        for line in fvocabulary:
-            # -1 elimina \n
-            spplited = line[:-1].split("\t")
+        # Nota: durante la carga masiva se deshabilita el garbage collector
+        # (los objetos creados no forman ciclos, por lo que las colecciones
+        # automáticas sólo recorrerían el vocabulario en construcción). El
+        # estado previo del collector se restaura al finalizar.
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            # Carga de encodes y chunk size de índice.
+            self.__load_index_data(reader)
 
-            term_id = int(spplited[0])
-            literal = spplited[1]
-            cstart = int(spplited[2])
-            csize = int(spplited[3])
+            # Nota: el vocabulario, el caller y el modo de carga se resuelven
+            # una única vez (y no por cada línea del vocabulario).
+            vocabulary = self.__vocabulary
 
             if self.__chunks_info_in_memory:
                 # Carga de chunks info en memoria.
-                r = self.__get_raw_chunks_info_caller(reader, csize)
-                self.__vocabulary[literal] = [term_id, r[0], r[1], r[2]]
-                self.__chunks_info_in_memory_count += len(r[2])
+                get_raw_chunks_info = self.__get_raw_chunks_info_caller
+                chunks_info_count = 0
+                for line in fvocabulary:
+                    # -1 elimina \n. Orden: term_id, literal, cstart y csize.
+                    term_id, literal, _, csize = line[:-1].split("\t")
+
+                    r = get_raw_chunks_info(reader, int(csize))
+                    vocabulary[literal] = [int(term_id), r[0], r[1], r[2]]
+                    chunks_info_count += len(r[2])
+                self.__chunks_info_in_memory_count += chunks_info_count
             else:
-                reader.seek(cstart)
-                # Carga de puntero a chunks info.
-                self.__vocabulary[literal] = [term_id, cstart, csize]
-
-        reader.close()
-        fvocabulary.close()
-        gc.collect()
+                for line in fvocabulary:
+                    # -1 elimina \n. Orden: term_id, literal, cstart y csize.
+                    term_id, literal, cstart, csize = line[:-1].split("\t")
+
+                    # Carga de puntero a chunks info.
+                    vocabulary[literal] = [int(term_id), int(cstart),
+                                           int(csize)]
+        finally:
+            if gc_enabled:
+                gc.enable()
+            reader.close()
+            fvocabulary.close()
 
     def is_loaded(self):
         '''Indica si el índice está cargado.
@@ -525,38 +592,100 @@ class Index(object):
         '''
         return self.__vocabulary
 
-    def __get_posting_from_chunks_info(self, posting_start, chunks_info):
-        '''Retorna posting list en base al byte de inicio de posting e info de
-            chunks dados.
+    def __get_postings_reader(self):
+        '''Retorna el reader de postings del índice (creándolo, si no existe).
+
+        Returns:
+            reader (IndexStreamReader): reader de postings.
+        '''
+        if self.__postings_reader is None:
+            # Nota: el archivo de postings se mapea en memoria (las lecturas
+            # no requieren llamadas al sistema y el page cache sirve las
+            # postings frecuentes). El acceso por query es aleatorio, por lo
+            # que se desactiva el read-ahead del kernel.
+            advice = getattr(mmap, "MADV_RANDOM", None)
+            self.__postings_reader = IndexStreamReader(self.postings_path,
+                                                       use_mmap=True,
+                                                       mmap_advice=advice)
+        return self.__postings_reader
+
+    def __get_chunksinfo_reader(self):
+        '''Retorna el reader de info de chunks del índice (creándolo, si no
+        existe).
+
+        Returns:
+            reader (IndexStreamReader): reader de info de chunks.
+        '''
+        if self.__chunksinfo_reader is None:
+            self.__chunksinfo_reader = IndexStreamReader(self.chunksinfo_path)
+        return self.__chunksinfo_reader
+
+    def close(self):
+        '''Libera los archivos abiertos por el índice para resolver queries.
+        El índice puede seguir utilizándose (los archivos se reabren ante una
+        nueva query).'''
+        if self.__postings_reader is not None:
+            self.__postings_reader.close()
+            self.__postings_reader = None
+
+        if self.__chunksinfo_reader is not None:
+            self.__chunksinfo_reader.close()
+            self.__chunksinfo_reader = None
+
+    def __get_multiencode_posting_lists(self, posting_start, chunks_info):
+        '''Retorna la posting list, como listas paralelas de docs y freqs, en
+        base al byte de inicio de posting e info de chunks dados, para el caso
+        de un índice multiencode (cada chunk indica sus encodes).
 
         Args:
             posting_start (int): byte de inicio de chunks de postings.
             chunks_info (ChunkInfo list): listado de info de chunks.
 
         Returns:
-            posting (dict): posting list desde el inicio de posting dado.
+            docs (int list): ids de documentos (ordenados) de la posting list.
+            freqs (int list): frecuencias de cada uno de los documentos.
         '''
-        # Nota: ver verificación de elementos repetidos al final del método.
-        # total_docs = []
         # Seek de reader en inicio de posting.
-        reader = IndexStreamReader(self.postings_path)
+        reader = self.__get_postings_reader()
         reader.seek(posting_start)
+        read = reader.read
 
-        posting = {}
+        # Nota: los docs de cada chunk son consecutivos (y sin repetidos), por
+        # lo que no es necesario un dict para unirlos.
+        docs, freqs = [], []
         for c in chunks_info:
-            docs = reader.read(c.docs_size, c.chunk_size, c.docs_encode)
-            freqs = reader.read(c.freqs_size, c.chunk_size,
-                                c.freqs_encode, use_gaps=False)
+            docs += read(c.docs_size, c.chunk_size, c.docs_encode)
+            freqs += read(c.freqs_size, c.chunk_size, c.freqs_encode,
+                          use_gaps=False)
+
+        return docs, freqs
+
+    def __get_monoencode_posting_lists(self, posting_start, chunks_info):
+        '''Retorna la posting list, como listas paralelas de docs y freqs, en
+        base al byte de inicio de posting e info de chunks dados, para el caso
+        de un índice monoencode. Dado que todos los chunks comparten encodes,
+        las funciones de lectura se especializan una única vez por posting.
 
-            posting.update(dict(zip(docs, freqs)))
-            # total_docs += docs
-        reader.close()
+        Args:
+            posting_start (int): byte de inicio de chunks de postings.
+            chunks_info (ChunkInfo list): listado de info de chunks.
+
+        Returns:
+            docs (int list): ids de documentos (ordenados) de la posting list.
+            freqs (int list): frecuencias de cada uno de los documentos.
+        '''
+        # Seek de reader en inicio de posting.
+        reader = self.__get_postings_reader()
+        reader.seek(posting_start)
+        read_docs = reader.get_read_caller(self.__doc_encode)
+        read_freqs = reader.get_read_caller(self.__freq_encode, use_gaps=False)
+
+        docs, freqs = [], []
+        for c in chunks_info:
+            docs += read_docs(c.docs_size, c.chunk_size)
+            freqs += read_freqs(c.freqs_size, c.chunk_size)
 
-        # if len(total_docs) != len(set(total_docs)):
-        #    ex = "Atención: los chunks tienen elementos repetidos entre sí. "
-        #    ex += "Docs: " + str(total_docs)
-        #    raise Exception(ex)
-        return posting
+        return docs, freqs
 
     def get_posting_pointer_by_term(self, term):
         '''Retorna puntero a posting en base a término literal dado por param.
@@ -574,7 +703,7 @@ class Index(object):
             return []
         elif not self.__chunks_info_in_memory:
             # Obtención de info de posting chunk desde disco.
-            reader = IndexStreamReader(self.chunksinfo_path)
+            reader = self.__get_chunksinfo_reader()
             reader.seek(pinfo[1])
             returned = self.__get_raw_chunks_info_caller(reader, pinfo[2])
             pstart, pcount, raw_chunks_info = returned
@@ -590,22 +719,13 @@ class Index(object):
         # Pointer: term_id, posting_start.
         pointer = PostingPointer(pinfo[0], pstart, pcount)
 
-        # Parseo de chunks info.
-        parsed_chunks_info = []
-
         # Cálculo de tamaños de chunks.
         chunk_sizes = self.__compute_chunk_sizes_caller(pointer.posting_count)
 
-        number = 1
-        for i in range(0, len(raw_chunks_info)):
-            to_parse = raw_chunks_info[i]
-            chunk_size = chunk_sizes[i]
-            parsed = self.__parse_raw_chunk_info_caller(to_parse, chunk_size,
-                                                        number)
-            parsed_chunks_info.append(parsed)
-            number += 1
-
-        pointer.chunks_info.extend(parsed_chunks_info)
+        # Parseo de chunks info (en lote, una única invocación por posting).
+        parsed = self.__parse_raw_chunks_info_caller(raw_chunks_info,
+                                                     chunk_sizes)
+        pointer.chunks_info.extend(parsed)
         return pointer
 
     def get_posting_by_term(self, term):
@@ -624,8 +744,54 @@ class Index(object):
         if not pointer:
             return {}
 
-        # Posting list.
-        posting = self.__get_posting_from_chunks_info(pointer.posting_start,
-                                                      pointer.chunks_info)
+        return self.get_posting_by_pointer(pointer)
+
+    def get_posting_by_pointer(self, pointer):
+        '''Retorna la posting list referenciada por el puntero dado.
+
+        Args:
+            pointer (PostingPointer): puntero a posting list.
+
+        Returns:
+            posting (dict): posting list (doc_id, freq).
+        '''
+        docs, freqs = self.get_posting_lists_by_pointer(pointer)
+        return dict(zip(docs, freqs))
+
+    def get_posting_lists_by_pointer(self, pointer):
+        '''Retorna la posting list referenciada por el puntero dado, como
+        listas paralelas de docs y freqs. Es más eficiente que
+        'get_posting_by_pointer' cuando no se requiere acceso por doc_id.
+
+        Args:
+            pointer (PostingPointer): puntero a posting list.
+
+        Returns:
+            docs (int list): ids de documentos (ordenados) de la posting list.
+            freqs (int list): frecuencias de cada uno de los documentos.
+        '''
+        return self.__get_posting_lists_caller(pointer.posting_start,
+                                               pointer.chunks_info)
+
+    def prefetch_postings(self, pointers):
+        '''Indica al sistema operativo que se leerán las posting lists
+        referenciadas por los punteros dados, de forma que éste las cargue en
+        caché de manera asincrónica mientras se decodifican las anteriores.
+        Nota: el consejo se aplica sobre el mapeo del reader de postings (sin
+        abrir otro descriptor), y no tiene efecto en plataformas que no
+        soportan 'madvise'.
+
+        Args:
+            pointers (PostingPointer list): punteros a posting lists.
+        '''
+        advice = getattr(mmap, "MADV_WILLNEED", None)
+        if advice is None or not pointers:
+            return
+
+        advise = self.__get_postings_reader().advise
+        for pointer in pointers:
+            size = 0
+            for c in pointer.chunks_info:
+                size += c.docs_size + c.freqs_size
 
-        return posting
+            advise(advice, pointer.posting_start, size)
@@ -5,23 +5,29 @@
 - Descripción: contiene las clases 'IndexerStatusTypes' 'Indexer' y 'ChildIndexer'
 que permiten la indexación de un corpus.
 - Autor: Agustín González
-- Modificado: 18/03/18
+- Modificado: 15/10/26
 '''
 
 import re
 import os
 import math
+import mmap
 import time
+import heapq
 import multiprocessing
 from enum import Enum
-from collections import Counter
+from array import array
+from operator import itemgetter, lt
+from itertools import count, groupby, islice, repeat
 
 from lib.index.index import Index
 from lib.index.tokenizer import Tokenizer
+from lib.index import encoderstats
 from lib.other import utils
-from lib.index.compression.ircodecs import EncodeTypes, gapsencoder as gapsenc
+from lib.index.compression.ircodecs import EncodeTypes
 from lib.index.compression.indexstream import IndexStreamWriter
 from lib.index.compression.indexstream import IndexStreamReader
+from lib.index.compression.indexstream import SEQUENTIAL_BUFFERING
 
 # Cantidad máxima de indexadores hijos.
 MAX_CHILD_INDEXERS = 4
@@ -42,6 +48,76 @@ MAX_TREC_DOCS_IN_MEMORY = 1500000
 # RESOURCES_FACTOR (rango [0.3-0.7]).
 RESOURCES_FACTOR = 0.5
 
+# Codificación de los subíndices temporales generados por los indexadores
+# hijos. Se utiliza VB por su velocidad de escritura/lectura, aunque se admite
+# cualquier codificación determinística (por ej., BitPacking, cuya
+# decodificación por bloques puede resultar más rápida en el merge).
+CHILD_INDEXES_ENCODE = EncodeTypes.VariableByte
+
+# Cantidad de filas de vocabulario que se acumulan antes de escribirlas.
+VOCABULARY_BATCH_SIZE = 16384
+
+# Formato de fila de vocabulario: term_id, literal, cstart y csize.
+_vocabulary_row = "{0}\t{1}\t{2}\t{3}\n".format
+
+# Indica si los archivos de estadísticas de codificación automática se deben
+# generar en formato binario (ver 'encoderstats.py'), lo que evita el parseo
+# de texto al analizarlos. En caso contrario, se generan en texto plano.
+BINARY_MULTIENCODE_STATS = True
+
+# Typecodes de los arrays de docs y freqs de las postings de los indexadores
+# hijos. Los docs son enteros de 64 bits con signo (los DOCNOs de TREC pueden
+# ser grandes, y el id es -1 antes del primer documento), mientras que las
+# freqs son enteros de 32 bits sin signo (la mitad de memoria).
+_DOCS_TYPECODE = "q"
+_FREQS_TYPECODE = "I"
+
+
+def _is_increasing(numbers):
+    '''Indica si la secuencia de números dada es estrictamente creciente.
+
+    Args:
+        numbers (int list): secuencia de números.
+
+    Returns:
+        True, si la secuencia es estrictamente creciente, False en caso
+            contrario.
+    '''
+    return all(map(lt, numbers, islice(numbers, 1, None)))
+
+
+# Indexadores hijos compartidos con los subprocesos de indexación.
+_child_indexers = []
+
+
+def _set_child_indexers(indexers):
+    '''Establece los indexadores hijos compartidos con los subprocesos de
+    indexación (ver '_create_child_indexes').
+
+    Args:
+        indexers (ChildIndexer list): indexadores hijos.
+    '''
+    global _child_indexers
+    _child_indexers = indexers
+
+
+def _create_child_indexes(number):
+    '''Ejecuta el indexador hijo dado (función invocada por los subprocesos
+    de indexación). Nota: sólo se recibe el número de indexador (y no el
+    indexador), lo que evita serializar su listado de archivos.
+
+    Args:
+        number (int): número (posición) de indexador hijo.
+
+    Returns:
+        number (int): número de indexador hijo.
+        dirindexes (string list): directorios de los índices generados por el
+            indexador hijo. Nota: se retornan los directorios (y no los
+            índices), lo que reduce el costo de serialización del resultado.
+    '''
+    indexes = _child_indexers[number].create_index()
+    return number, [index.dirindex for index in indexes]
+
 
 class IndexerStatusTypes(Enum):
     '''Tipos de estado de Indexer.'''
@@ -103,13 +179,20 @@ class Indexer(object):
         self._pwriter = None  # writer de postings.
         self._cwriter = None  # writer de chunks info.
         self._vwriter = None  # writer de vocabulario.
+        self._vrows = None    # filas de vocabulario pendientes de escritura.
 
         # Directorio de archivos temporales.
-        self.__dirtmp = "output//tmp//" + os.path.basename(self.__dirin)
+        self.__dirtmp = os.path.join("output", "tmp",
+                                     os.path.basename(self.__dirin))
 
         # Índices hijos.
         self.__child_indexes = []
 
+        # Cantidad de índices hijos restantes de los que se cargará la info de
+        # chunks a RAM (se calcula al computar los archivos de los indexadores
+        # hijos o, si no se conoce la cantidad de subíndices, al mergear).
+        self.__cdata_indexes_to_load = None
+
         # Generación de listas de archivos para subindexadores.
         self.__compute_child_indexes_files()
 
@@ -117,10 +200,17 @@ class Indexer(object):
         '''Computa los archivos a procesar por los indexadores hijos.'''
         fnames = []
 
-        # Walk en filenames según directorio de In.
+        # Nombres de archivo (basenames): os.walk ya los provee, por lo que no
+        # es necesario recalcularlos por c/documento indexado.
+        docnames = []
+
+        # Walk en filenames según directorio de In. Nota: os.walk se basa en
+        # os.scandir (sin un stat por archivo), y los paths de cada directorio
+        # se agregan en lote.
+        join = os.path.join
         for root, _, dirfnames in os.walk(self.__dirin):
-            for filename in dirfnames:
-                fnames.append(os.path.join(root, filename))
+            fnames.extend(map(join, repeat(root), dirfnames))
+            docnames.extend(dirfnames)
 
         # fnames = fnames[0:35]
 
@@ -131,18 +221,24 @@ class Indexer(object):
         self.__child_indexers_files = []
         for i in range(0, len(fnames), chunk_files_size):
             j = i+chunk_files_size
-            chunk = fnames[i:j]
 
-            # Range de files_id: se toma el rango start_fid a end_fid, ya que
-            # los ids se manejan de forma global (y no por c/ subíndice hijo),
-            # lo que luego facilita el merge.
+            # Files_id: los ids se manejan de forma global (y no por c/
+            # subíndice hijo), lo que luego facilita el merge. Nota: el id de
+            # cada archivo se deriva de su posición (start_fid + posición),
+            # por lo que no es necesario un dict de ids y archivos.
             start_fid = i+1  # +1 ya que i es índice.
-            end_fid = j+1    # +1 ya que j es índice.
-            fids = range(start_fid, end_fid+1)
-
-            # Mapeo chunks, ids.
-            chunk = dict(zip(fids, chunk))
-            self.__child_indexers_files.append(chunk)
+            self.__child_indexers_files.append((start_fid, fnames[i:j],
+                                                docnames[i:j]))
+
+        # Cantidad de subíndices de los que se cargará la info de chunks a RAM.
+        # Nota: en corpus de archivos, c/indexador hijo genera un único
+        # subíndice, por lo que su cantidad se conoce de antemano. En TREC, un
+        # indexador puede generar varios (flush), por lo que el cálculo se
+        # difiere al merge (ver '__merge_child_indexes').
+        if self.__corpus_type != CorpusTypes.Trec:
+            indexes_count = len(self.__child_indexers_files)
+            self.__cdata_indexes_to_load = int(round(indexes_count *
+                                                     RESOURCES_FACTOR, 0))
 
     def __create_child_indexes(self):
         '''Crea (vía threads) los índices hijos basados en los archivos
@@ -159,31 +255,71 @@ class Indexer(object):
         pool_size = int(round(child_count*RESOURCES_FACTOR, 0))
 
         print("Cantidad de subprocesos:", pool_size)
-        pool = multiprocessing.Pool(pool_size)
 
-        results = []    # Results de subprocesos.
+        indexers = []   # Indexadores hijos.
         idx_id = 1      # id de subindexer.
 
-        for fnames in self.__child_indexers_files:
-            dirout = self.__dirtmp + "//" + str(idx_id)
+        for start_fid, fnames, docnames in self.__child_indexers_files:
+            dirout = os.path.join(self.__dirtmp, str(idx_id))
 
-            indexer = ChildIndexer(idx_id, fnames, dirout, self.__corpus_type)
-            result = pool.apply_async(indexer.create_index)
-            results.append(result)
-            # self.__child_indexes.extend(indexer.create_index())
+            indexer = ChildIndexer(idx_id, start_fid, fnames, docnames,
+                                   dirout, self.__corpus_type)
+            indexers.append(indexer)
             idx_id += 1
+
+        # Pool de subprocesos (con el método de inicio por defecto). Nota: con
+        # 'fork', los subprocesos heredan los indexadores hijos (vía
+        # copy-on-write), sin serializarlos. En otro caso (por ej., 'spawn',
+        # en plataformas sin fork), los subprocesos no heredan el estado del
+        # módulo, por lo que los indexadores se transfieren una única vez por
+        # subproceso (initializer).
+        if multiprocessing.get_start_method() == "fork":
+            _set_child_indexers(indexers)
+            pool = multiprocessing.Pool(pool_size)
+        else:
+            pool = multiprocessing.Pool(pool_size, _set_child_indexers,
+                                        (indexers,))
+
+        # Nota: los subíndices se cargan a medida que finalizan sus
+        # indexadores (en paralelo a la indexación de los restantes), y no
+        # una vez finalizados todos. Si la cantidad de subíndices no se conoce
+        # de antemano (TREC), la carga se difiere al merge.
+        results = [None]*child_count
+        jobs = range(child_count)
+        for i, dirindexes in pool.imap_unordered(_create_child_indexes, jobs):
+            indexes = [Index(dirindex) for dirindex in dirindexes]
+            if self.__cdata_indexes_to_load is not None:
+                for index in indexes:
+                    self.__load_child_index(index)
+            results[i] = indexes
+
         # Espera de finalización de subprocesos.
         pool.close()
         pool.join()
+        _set_child_indexers([])
 
-        # Obtención de índices.
-        results = [r.get() for r in results]
-
+        # Nota: los índices se agregan en el orden de los indexadores (y no en
+        # el de finalización), lo que preserva el orden de los ids de docs.
         for indexes in results:
-            self.__child_indexes.extend([index for index in indexes])
+            self.__child_indexes.extend(indexes)
 
         del pool
 
+    def __load_child_index(self, index):
+        '''Carga el índice hijo dado (si no se encuentra cargado). La info de
+        chunks se carga a RAM hasta alcanzar la cantidad de subíndices
+        admitida (ver 'RESOURCES_FACTOR').
+
+        Args:
+            index (Index): índice hijo.
+        '''
+        if index.is_loaded():
+            return
+
+        index.load(chunks_info_in_memory=self.__cdata_indexes_to_load > 0)
+        self.__cdata_indexes_to_load -= 1
+        print("Subíndice {0} cargado.".format(index.dirindex))
+
     def __merge_child_collections(self):
         '''Realiza merge de colecciones de docs de índices hijos.'''
         merged_collection = []
@@ -214,29 +350,9 @@ class Indexer(object):
         if os.path.exists(self.__dirtmp):
             os.rmdir(self.__dirtmp)
 
-    def __create_vocabulary_by_child_indexes(self):
-        '''Retorna un diccionario de términos, donde cada key contiene a una
-        lista que indica en qué índices es posible encontrar dicho término.
-
-        Returns:
-            terms (dict): diccionario de terms e índices.
-        '''
-        terms = {}
-        indexes = self.__child_indexes
-
-        terms = {}
-        for i in range(0, len(indexes)):
-            terms_by_index = indexes[i].get_vocabulary()
-
-            for term in terms_by_index:
-                if term not in terms.keys():
-                    terms[term] = []
-                terms[term].append(i)
-        return terms
-
-    def __print_merge_progress(self, term_id, terms_size):
+    def __print_merge_progress(self, terms_count):
         '''Imprime en pantalla el progreso de merge de términos.'''
-        print("Merged {0}/{1}".format(term_id, terms_size))
+        print("Merged {0}".format(terms_count))
 
     def _write_encode_and_chunk_info(self):
         '''Escribe el tamaño de particionado (chunk) utilizado y los tipos de
@@ -266,10 +382,38 @@ class Indexer(object):
 
         indexes = self.__child_indexes
 
-        indexes_by_terms = self.__create_vocabulary_by_child_indexes()
+        # Merge (k-way) de vocabularios de índices hijos: cada vocabulario se
+        # itera en orden (los hijos lo escriben ordenado), generando tuplas
+        # (término, nro. de índice) ordenadas, sin construir un diccionario
+        # con todos los términos.
+        vocabularies = [zip(index.get_vocabulary(), repeat(i))
+                        for i, index in enumerate(indexes)]
+        terms = groupby(heapq.merge(*vocabularies), key=itemgetter(0))
 
         # Archivos de postings list (perm. lectura secuencial, evitando seeks).
-        pfiles = [IndexStreamReader(i.postings_path) for i in indexes]
+        # Nota: se mapean en memoria, con lectura anticipada por parte del
+        # kernel (los archivos vacíos no pueden mapearse, aunque tampoco se
+        # leen).
+        advice = getattr(mmap, "MADV_SEQUENTIAL", None)
+        pfiles = []
+        for i in indexes:
+            use_mmap = os.path.getsize(i.postings_path) > 0
+            pfiles.append(IndexStreamReader(i.postings_path,
+                                            SEQUENTIAL_BUFFERING,
+                                            use_mmap=use_mmap,
+                                            mmap_advice=advice))
+
+        # Callers de lectura de docs y freqs por subíndice. Nota: se lee con
+        # las codificaciones de cada subíndice (ver 'CHILD_INDEXES_ENCODE'),
+        # resolviendo el encode una única vez; el gapsdecode de docs se
+        # realiza vía suma acumulada.
+        docs_readers = []
+        freqs_readers = []
+        for index, pfile in zip(indexes, pfiles):
+            doc_encode, freq_encode = index.get_encodes()
+            docs_readers.append(pfile.get_read_caller(doc_encode))
+            freqs_readers.append(pfile.get_read_caller(freq_encode,
+                                                       use_gaps=False))
 
         # Writer de merge de posting.
         self._pwriter = IndexStreamWriter(self.index.postings_path)
@@ -277,50 +421,62 @@ class Indexer(object):
         # Writer de merge de chunks data.
         self._cwriter = IndexStreamWriter(self.index.chunksinfo_path)
 
-        # Writer de merge de vocabulario: buffer de escritura de 5 MiB.
-        vocabulary_path = self.index.vocabulary_path
-        self._vwriter = open(vocabulary_path, "w", buffering=5*(1024**2))
+        # Writer de merge de vocabulario.
+        self._open_vocabulary_writer(self.index.vocabulary_path)
 
         # Escritura de info de encode.
         self._write_encode_and_chunk_info()
 
         term_id = 1
-        terms = sorted(indexes_by_terms.keys())
-        for term in terms:
+        for term, term_indexes in terms:
             if term_id % 25000 == 0:
-                self.__print_merge_progress(term_id, len(terms))
-
-            merged = Counter()
-
-            # Nota: indexes_by_terms[term] contiene lista de índices en donde
-            # se puede encontrar el término.
-            for index in indexes_by_terms[term]:
+                self.__print_merge_progress(term_id)
+
+            # Nota: las posting lists de los subíndices se concatenan en forma
+            # directa (sin dict ni sort), siempre que los docs resulten
+            # crecientes. Esto no se cumple si los ids de los subíndices no
+            # son crecientes entre sí (por ej., DOCNOs de TREC).
+            docs, freqs = [], []
+            ordered = True
+
+            # Nota: term_indexes contiene las tuplas (término, índice) de los
+            # índices en donde se puede encontrar el término.
+            for _, index in term_indexes:
                 pointer = indexes[index].get_posting_pointer_by_term(term)
+                read_docs = docs_readers[index]
+                read_freqs = freqs_readers[index]
                 for c in pointer.chunks_info:
-                    # Nota: se lee directamente en vb (método en el que indexan
-                    # los subindexers) para evitar branchs de la función read()
-                    # en la verificación del encode especificado.
-
-                    # Lectura de docs y gapsdecode.
-                    docs = gapsenc.decode(pfiles[index].read_vb(c.docs_size))
-
-                    # Lectura de freqs (no gapsdecode).
-                    freqs = pfiles[index].read_vb(c.freqs_size)
-
-                    # Merge de chunks.
-                    merged.update(dict(zip(docs, freqs)))
+                    # Lectura de docs (con gapsdecode) y freqs.
+                    chunk_docs = read_docs(c.docs_size, c.chunk_size)
+                    if docs and chunk_docs[0] <= docs[-1]:
+                        ordered = False
+
+                    docs += chunk_docs
+                    freqs += read_freqs(c.freqs_size, c.chunk_size)
+
+            if ordered:
+                self._append_lists_to_vocabulary_and_posting(term_id, term,
+                                                             docs, freqs)
+            else:
+                # Merge vía dict (en caso de docs repetidos en distintos
+                # subíndices, sus freqs se acumulan).
+                merged = {}
+                for doc_id, freq in zip(docs, freqs):
+                    merged[doc_id] = merged.get(doc_id, 0) + freq
+                self._append_to_vocabulary_and_posting(term_id, term, merged)
+            term_id += 1
 
-            # Eliminación de lista leída ¿liberación de memoria?
-            del indexes_by_terms[term]
+        self.__print_merge_progress(term_id - 1)
 
-            self._append_to_vocabulary_and_posting(term_id, term, merged)
-            term_id += 1
+        # Close de archivos de postings y de readers de índices hijos.
+        for pfile in pfiles:
+            pfile.close()
 
-        self.__print_merge_progress(len(terms), len(terms))
+        for index in indexes:
+            index.close()
 
         # Close de archivo de vocabulario.
-        self._vwriter.close()
-        self._vwriter = None
+        self._close_vocabulary_writer()
 
         # Flush y close de writer de posting.
         self._pwriter.flush()
@@ -340,33 +496,33 @@ class Indexer(object):
             self._multiencode_stats_freqs_file.close()
             self._multiencode_stats_freqs_file = None
 
-        # Liberación de memoria.
-        del indexes_by_terms
-        del terms
-
     def __merge_child_indexes(self):
         '''Mergea los índices creados por los indexadores hijos.'''
         utils.makedirs(self._dirout)
 
-        # Cálculo de cantidad de índices de los que se cargarán la información
-        # de chunks a RAM.
         child_count = len(self.__child_indexes)
-        cdata_indexes_to_load = int(round(child_count*RESOURCES_FACTOR, 0))
+
+        # Cálculo de cantidad de índices de los que se cargarán la información
+        # de chunks a RAM (si no se conocía la cantidad de subíndices, es
+        # decir, para corpus TREC).
+        if self.__cdata_indexes_to_load is None:
+            cdata_indexes_to_load = int(round(child_count*RESOURCES_FACTOR,
+                                              0))
+            self.__cdata_indexes_to_load = cdata_indexes_to_load
 
         print("\nMergeando...")
-        info = "Total de subíndices: {0} ({1}/{0} con chunks info en RAM)."
-        print(info.format(child_count, cdata_indexes_to_load))
         print("Cargando subíndices...")
 
-        # Load de indexadores hijos.
-        for i in range(0, len(self.__child_indexes)):
-            index = self.__child_indexes[i]
+        # Load de indexadores hijos (no cargados).
+        for index in self.__child_indexes:
+            self.__load_child_index(index)
+
+        # Cantidad de subíndices cargados con info de chunks en RAM.
+        cdata_indexes_count = sum(index.get_chunks_info_in_memory_count()[1]
+                                  for index in self.__child_indexes)
 
-            if not index.is_loaded():
-                index.load(chunks_info_in_memory=cdata_indexes_to_load > 0)
-                cdata_indexes_to_load -= 1
-                info = "Subíndice {0}/{1} cargado."
-                print(info.format(i+1, child_count))
+        info = "Total de subíndices: {0} ({1}/{0} con chunks info en RAM)."
+        print(info.format(child_count, cdata_indexes_count))
 
         self.__merge_child_collections()
         self.__merge_child_postings()
@@ -383,25 +539,33 @@ class Indexer(object):
         '''
         writer = None
 
+        # Extensión, modo de apertura y función de escritura según formato.
+        ext, mode = ".txt", "w"
+        write_record = encoderstats.write_text_record
+        if BINARY_MULTIENCODE_STATS:
+            ext, mode = encoderstats.BINARY_EXTENSION, "wb"
+            write_record = encoderstats.write_binary_record
+
         if ftype == PostingFieldTypes.Docs:
+            typecode = encoderstats.DOCS_TYPECODE
             writer = self._multiencode_stats_docs_file
             if not writer:
-                path = self._dirout + "//other//encoder_docs_statistics.txt"
+                path = os.path.join(self._dirout, "other",
+                                    "encoder_docs_statistics" + ext)
                 utils.makedirs(os.path.dirname(path))
-                writer = open(path, "w")
+                writer = open(path, mode)
                 self._multiencode_stats_docs_file = writer
         else:
+            typecode = encoderstats.FREQS_TYPECODE
             writer = self._multiencode_stats_freqs_file
             if not writer:
-                path = self._dirout + "//other//encoder_freqs_statistics.txt"
+                path = os.path.join(self._dirout, "other",
+                                    "encoder_freqs_statistics" + ext)
                 utils.makedirs(os.path.dirname(path))
-                writer = open(path, "w")
+                writer = open(path, mode)
                 self._multiencode_stats_freqs_file = writer
 
-        data = "Term: " + term + "; "
-        data += "EncodeType: " + str(etype.name) + "; "
-        data += "Numbers: " + str(numbers) + "\n"
-        writer.write(data)
+        write_record(writer, term, etype, numbers, typecode)
 
     def _write_multiencode_block(self, term, pftype, numbers, etypes):
         '''Escribe un bloque de números utilizando multiencode.
@@ -465,9 +629,34 @@ class Indexer(object):
             term (string): termino (literal).
             docs (dict): dict de docs del término y sus freqs.
         '''
-        chunk_size = len(docs) if self._chunk_size == 0 else self._chunk_size
-        doc_keys = sorted(list(docs))
-        freqs = [docs[doc_id] for doc_id in doc_keys]
+        doc_keys = list(docs)
+        sorted_doc_keys = sorted(doc_keys)
+
+        # Nota: usualmente, los docs se agregan en orden creciente (por ej.,
+        # en los subindexadores de archivos), en cuyo caso las freqs se
+        # obtienen directamente de los values del dict (sin un lookup por
+        # doc). Timsort ordena una lista ya ordenada en tiempo lineal.
+        if doc_keys == sorted_doc_keys:
+            freqs = list(docs.values())
+        else:
+            doc_keys = sorted_doc_keys
+            freqs = list(map(docs.__getitem__, doc_keys))
+
+        self._append_lists_to_vocabulary_and_posting(term_id, term, doc_keys,
+                                                     freqs)
+
+    def _append_lists_to_vocabulary_and_posting(self, term_id, term, doc_keys,
+                                                 freqs):
+        '''Agrega vocabulario y posting a los archivos correspondientes, a
+        partir de listas paralelas de docs y freqs.
+
+        Args:
+            term_id (int): identificador de término.
+            term (string): termino (literal).
+            doc_keys (int list): docs del término (ordenados, sin repetidos).
+            freqs (int list): frecuencias de cada uno de los docs.
+        '''
+        chunk_size = self._chunk_size or len(doc_keys)
 
         # Escritura de info de chunks.
         cinfo_start_byte = self._cwriter.begin_block(use_gaps=False)
@@ -478,38 +667,77 @@ class Indexer(object):
         pcount = len(doc_keys)-1
         self._cwriter.write([pstart, pcount], etype=EncodeTypes.VariableByte)
 
+        # Nota: los callers, encodes y tipos de posting fields se resuelven
+        # una única vez (y no por cada chunk).
+        write_docs = self._write_docs_caller
+        write_freqs = self._write_freqs_caller
+        doc_encode = self.doc_encode
+        freq_encode = self.freq_encode
+        docs_field = PostingFieldTypes.Docs
+        freqs_field = PostingFieldTypes.Freqs
+        cwrite = self._cwriter.write
+        multiencode = self._multiencode
+
+        # Tamaños de bloques de docs y freqs de cada chunk. Nota: en caso de
+        # monoencode, la info de chunks es íntegramente VB, por lo que se
+        # escribe en una única invocación por posting.
+        sizes = []
+
         # Escritura de posting en chunks, según chunk_size.
         for i in range(0, len(doc_keys), chunk_size):
             j = i + chunk_size
 
             # Escritura de documentos.
-            pftype = PostingFieldTypes.Docs
-            returned = self._write_docs_caller(term, pftype, doc_keys[i:j],
-                                               self.doc_encode)
-            docs_size, doc_enc = returned
+            docs_size, doc_enc = write_docs(term, docs_field, doc_keys[i:j],
+                                            doc_encode)
 
             # Escritura de frecuencias.
-            pftype = PostingFieldTypes.Freqs
-            returned = self._write_freqs_caller(term, pftype, freqs[i:j],
-                                                self.freq_encode)
-            freqs_size, freq_enc = returned
+            freqs_size, freq_enc = write_freqs(term, freqs_field, freqs[i:j],
+                                               freq_encode)
 
             # En caso de esquema multicompresión...
-            if self._multiencode:
+            if multiencode:
                 # Información para descompresión del chunk.
                 encode_info = (doc_enc.value << 4) + freq_enc.value
                 etype = EncodeTypes.ByteBlocks
-                self._cwriter.write([encode_info], etype=etype, block_size=1)
+                cwrite([encode_info], etype=etype, block_size=1)
+                cwrite([docs_size, freqs_size], etype=EncodeTypes.VariableByte)
+            else:
+                sizes += (docs_size, freqs_size)
 
-            self._cwriter.write([docs_size, freqs_size],
-                                etype=EncodeTypes.VariableByte)
+        if sizes:
+            cwrite(sizes, etype=EncodeTypes.VariableByte)
 
         cinfo_end_byte = self._cwriter.close_block()[0]
         cinfo_size = cinfo_end_byte - cinfo_start_byte
 
-        vocabulary = str(term_id) + "\t" + term + "\t"
-        vocabulary += str(cinfo_start_byte) + "\t" + str(cinfo_size) + "\n"
-        self._vwriter.write(vocabulary)
+        # Nota: las filas de vocabulario se escriben en lotes.
+        vrows = self._vrows
+        vrows.append(_vocabulary_row(term_id, term, cinfo_start_byte,
+                                     cinfo_size))
+        if len(vrows) >= VOCABULARY_BATCH_SIZE:
+            self._flush_vocabulary_rows()
+
+    def _open_vocabulary_writer(self, path):
+        '''Abre el writer de vocabulario (con buffer de escritura de 5 MiB).
+
+        Args:
+            path (string): archivo de vocabulario.
+        '''
+        self._vwriter = open(path, "w", buffering=5*(1024**2))
+        self._vrows = []
+
+    def _flush_vocabulary_rows(self):
+        '''Escribe las filas de vocabulario pendientes.'''
+        self._vwriter.write("".join(self._vrows))
+        self._vrows.clear()
+
+    def _close_vocabulary_writer(self):
+        '''Escribe las filas de vocabulario pendientes y cierra el writer.'''
+        self._flush_vocabulary_rows()
+        self._vwriter.close()
+        self._vwriter = None
+        self._vrows = None
 
     def _dump_docs_dict(self, docs, index):
         '''Vuelca a disco la colección de documentos pasada por parámetro.
@@ -518,11 +746,12 @@ class Indexer(object):
             docs (dict): hash de documentos.
             index (Index): índice donde se deberán volcar los docs.
         '''
-        writer = open(index.collection_path, "w")
+        # Nota: buffer de escritura de 5 MiB.
+        writer = open(index.collection_path, "w", buffering=5*(1024**2))
 
-        for doc_id in docs:
-            # doc_id, doc_name
-            writer.write(str(doc_id) + "\t" + str(docs[doc_id]) + "\n")
+        # Escritura en lote (doc_id, doc_name), sin un write por documento.
+        line = "{0}\t{1}\n".format
+        writer.writelines(line(doc_id, name) for doc_id, name in docs.items())
 
         writer.close()
 
@@ -536,7 +765,7 @@ class Indexer(object):
 
         if not self.__child_indexes:
             for i in child_dirs:
-                full_dir = self.__dirtmp + "//" + i
+                full_dir = os.path.join(self.__dirtmp, i)
                 index = Index(full_dir)
                 self.__child_indexes.append(index)
         return self.__child_indexes
@@ -627,16 +856,16 @@ class Indexer(object):
         info += "\nVocabulary: {2} MiB"
         info += "\nPostings: {3} MiB"
 
-        coll_size = ((os.path.getsize(self.index.collection_path))/1024)/1024
-        chin_size = ((os.path.getsize(self.index.chunksinfo_path))/1024)/1024
-        voca_size = ((os.path.getsize(self.index.vocabulary_path))/1024)/1024
-        post_size = ((os.path.getsize(self.index.postings_path))/1024)/1024
-        info = info.format(round(coll_size, 1), round(chin_size, 1),
-                           round(voca_size, 1), round(post_size, 1))
+        # Tamaños (en MiB) de archivos de índice.
+        paths = (self.index.collection_path, self.index.chunksinfo_path,
+                 self.index.vocabulary_path, self.index.postings_path)
+        info = info.format(*[round(os.stat(path).st_size/1024**2, 1)
+                             for path in paths])
 
         print("\n" + info + "\n")
-        utils.makedirs(self._dirout + "//other/")
-        fstatus = open(self._dirout + "//other/status.txt", "w")
+        dirother = os.path.join(self._dirout, "other")
+        utils.makedirs(dirother)
+        fstatus = open(os.path.join(dirother, "status.txt"), "w")
         fstatus.write(info)
         fstatus.close()
 
@@ -646,21 +875,25 @@ class Indexer(object):
 
 class ChildIndexer(Indexer):
 
-    def __init__(self, indexer_id, fnames, dirout, corpus_type):
+    def __init__(self, indexer_id, start_fid, fnames, docnames, dirout,
+                 corpus_type):
         '''Inicializa subindexador.
         Args:
             indexer_id (int): identificador de sub-indexador.
+            start_fid (int): id del primer archivo a procesar (los ids de los
+                siguientes son consecutivos).
             fnames (string list): lista de archivos a procesar.
+            docnames (string list): nombres (basenames) de los archivos a
+                procesar.
             dirout (string): directorio de salida.
             corpus_type (CorpusTypes): tipo de corpus.
         '''
         # Lista de índices generados.
         self.indexes = []
 
-        # Los childs codifican los subíndices en VB, ya que posee un tiempo de
-        # escritura/lectura bastante rápido en relación a otras codificaciones.
-        self.doc_encode = EncodeTypes.VariableByte
-        self.freq_encode = EncodeTypes.VariableByte
+        # Codificación de subíndices (ver 'CHILD_INDEXES_ENCODE').
+        self.doc_encode = CHILD_INDEXES_ENCODE
+        self.freq_encode = CHILD_INDEXES_ENCODE
 
         # Writer callers.
         self._multiencode = False
@@ -671,10 +904,14 @@ class ChildIndexer(Indexer):
         self._chunk_size = 0
         self.__indexer_id = indexer_id
         self.__corpus_type = corpus_type
+        self.__start_fid = start_fid
         self.__fnames = fnames
+        self.__docnames = docnames
 
-        # Tag remover (para corpus html).
-        self.__html_tag_remover = re.compile(r'<[^>]+>')
+        # Tag remover (para corpus html). Nota: los tags no se extienden más
+        # allá de un salto de línea (como en la lectura línea a línea), por lo
+        # que el regex puede aplicarse sobre el documento completo.
+        self.__html_tag_remover = re.compile(r'<[^>\n]+>')
 
         # Var. que permite medir el tiempo transcurrido cada vez que se invoca
         # al método '__print_indexer_info()'.
@@ -693,28 +930,45 @@ class ChildIndexer(Indexer):
         Returns:
             parsed (string): texto sin tags html.
         '''
+        # Nota: la búsqueda de '<' (en C) es considerablemente más rápida que
+        # la ejecución del regex, por lo que éste sólo se aplica si el texto
+        # puede contener tags.
+        if "<" not in text:
+            return text
         return self.__html_tag_remover.sub('', text)
 
-    def __check_term(self, terms, doc_id, token):
-        '''Verifica si un token es término y, en caso positivo, lo agrega al
-        hash de términos.
+    def __check_terms(self, terms, doc_id, text):
+        '''Verifica qué tokens del texto son términos y los agrega al hash de
+        términos. Nota: los tokens se convierten en lote (ver
+        'Tokenizer.convert2terms'), resolviendo las funciones utilizadas fuera
+        del ciclo.
 
         Args:
             terms (dict): hash de términos.
             doc_id (int): id de documento.
-            token (string): token a verificar.
+            text (string): texto (tokens separados por espacio) a verificar.
         '''
-        if token:
-            # Conversión de token a término.
-            term = Tokenizer.convert2term(token)
-
-            if term is not None:
-                # Agregación de término (SPIMI - paso 1)
-                if term not in terms:
-                    terms[term] = Counter()
-
-                # Agregación directa a posting (SPIMI - paso 2)
-                terms[term][doc_id] += 1
+        get_posting = terms.get
+
+        for term in Tokenizer.convert2terms(text):
+            # Agregación de término (SPIMI - paso 1). Nota: las postings son
+            # arrays paralelos de docs y freqs (considerablemente más
+            # compactos que un dict por término).
+            posting = get_posting(term)
+            if posting is None:
+                terms[term] = (array(_DOCS_TYPECODE, (doc_id,)),
+                               array(_FREQS_TYPECODE, (1,)))
+                continue
+
+            # Agregación directa a posting (SPIMI - paso 2). Nota: los tokens
+            # de un documento se procesan en forma consecutiva, por lo que
+            # basta con verificar el último doc de la posting.
+            docs, freqs = posting
+            if docs[-1] == doc_id:
+                freqs[-1] += 1
+            else:
+                docs.append(doc_id)
+                freqs.append(1)
 
     def __print_indexation_progress(self, doc_number, total_docs=None):
         '''Imprime en pantalla el progreso de indexación.'''
@@ -741,20 +995,29 @@ class ChildIndexer(Indexer):
         self._pwriter = IndexStreamWriter(index.postings_path)
         self._cwriter = IndexStreamWriter(index.chunksinfo_path)
 
-        # Writer: buffer de escritura de 5 MiB.
-        buffering = 5*(1024**2)
-        self._vwriter = open(index.vocabulary_path, "w", buffering=buffering)
+        # Writer de vocabulario.
+        self._open_vocabulary_writer(index.vocabulary_path)
 
         # Escritura de info de compresión.
         self._write_encode_and_chunk_info()
 
         term_id = 1
         for term in sorted(terms):
-            # Documentos.
-            docs = terms[term]
+            # Documentos y frecuencias.
+            docs, freqs = terms[term]
 
             # Postings.
-            super()._append_to_vocabulary_and_posting(term_id, term, docs)
+            if _is_increasing(docs):
+                super()._append_lists_to_vocabulary_and_posting(
+                    term_id, term, docs.tolist(), freqs.tolist())
+            else:
+                # Docs no ordenados o repetidos (por ej., DOCNOs de TREC
+                # repetidos): merge vía dict, acumulando freqs.
+                merged = {}
+                for doc_id, freq in zip(docs, freqs):
+                    merged[doc_id] = merged.get(doc_id, 0) + freq
+                super()._append_to_vocabulary_and_posting(term_id, term,
+                                                          merged)
             term_id += 1
 
         self._pwriter.flush()
@@ -765,8 +1028,7 @@ class ChildIndexer(Indexer):
         self._cwriter.close()
         self._cwriter = None
 
-        self._vwriter.close()
-        self._vwriter = None
+        self._close_vocabulary_writer()
         terms = {}
 
     def _save(self, docs, terms, dirout):
@@ -811,25 +1073,33 @@ class ChildIndexer(Indexer):
         self.__start_bench_info_date = time.time()
         docs_processed = 0
         total_docs = len(self.__fnames)
+        is_html = self.__corpus_type == CorpusTypes.Html
+
+        # Cantidad de docs procesados a partir de la cual se imprime el
+        # progreso (evita el cálculo del módulo por c/doc).
+        next_progress = 0
 
-        for fid in self.__fnames:
-            if docs_processed % 5000 == 0:
+        fids = count(self.__start_fid)
+        for fid, fname, docname in zip(fids, self.__fnames, self.__docnames):
+            if docs_processed >= next_progress:
                 self.__print_indexation_progress(docs_processed, total_docs)
+                next_progress += 5000
 
             # Docname, dado por basename de fid.
-            docname = os.path.basename(self.__fnames[fid])
             docs[fid] = docname
 
-            document_file = open(self.__fnames[fid])
-            for line in document_file:
-                if self.__corpus_type == CorpusTypes.Html:
-                    line = self.__remove_tags(line)
+            # Lectura del documento completo: evita la creación de un objeto
+            # por línea y permite tokenizar el texto en una única pasada.
+            document_file = open(fname)
+            text = document_file.read()
+            document_file.close()
 
-                tokens = line.split(" ")
+            if is_html:
+                text = self.__remove_tags(text)
 
-                for token in tokens:
-                    self.__check_term(terms, fid, token)
-            document_file.close()
+            # Los saltos de línea separan tokens (como en la lectura línea a
+            # línea).
+            self.__check_terms(terms, fid, text.replace("\n", " "))
 
             docs_processed += 1
 
@@ -885,8 +1155,16 @@ class ChildIndexer(Indexer):
         # Indentificador de subíndice/s generado/s.
         subindex_id = 1
 
-        for fid in self.__fnames:
-            trec_file = open(self.__fnames[fid])
+        # Cantidad de docs procesados a partir de la cual se imprime el
+        # progreso y se verifica el flush (evita el cálculo del módulo por
+        # c/doc).
+        next_progress = 0
+
+        for fname in self.__fnames:
+            # Nota: los archivos TREC se leen en forma secuencial, por lo que
+            # se utiliza un buffer amplio (menor cantidad de syscalls). La
+            # decodificación por bloques la realiza el wrapper de texto (en C).
+            trec_file = open(fname, buffering=SEQUENTIAL_BUFFERING)
             for line in trec_file:
                 line = line[:-1]
 
@@ -908,16 +1186,20 @@ class ChildIndexer(Indexer):
                     continue
                 # Si ha finalizado procesamiento de un documento...
                 elif line == "</DOC>":
-                    if docs_processed % 50000 == 0:
+                    if docs_processed >= next_progress:
                         self.__print_indexation_progress(docs_processed)
+                        next_progress += 50000
 
                         # Flush al superar la cantidad máx de docs en mem.
                         if len(docs) >= MAX_TREC_DOCS_IN_MEMORY:
                             self.__flush_subindex(docs, terms, subindex_id)
                             subindex_id += 1
-                            del docs, terms
-                            docs = {}
-                            terms = {}
+
+                            # Nota: los hash se vacían (y no se reemplazan por
+                            # nuevos), pues 'create_index' mantiene referencias
+                            # a los originales.
+                            docs.clear()
+                            terms.clear()
 
                     # Si el documento procesado es nuevo en el dict.
                     if is_new_doc:
@@ -926,10 +1208,8 @@ class ChildIndexer(Indexer):
                     continue
 
                 # Verificación de tokes.
-                tokens = line.split(" ")
-
-                for token in tokens:
-                    self.__check_term(terms, doc_id, token)
+                self.__check_terms(terms, doc_id, line)
+            trec_file.close()
 
         self.__print_indexation_progress(docs_processed, docs_processed)
 
@@ -937,8 +1217,6 @@ class ChildIndexer(Indexer):
         if docs or terms:
             self.__flush_subindex(docs, terms, subindex_id)
 
-        trec_file.close()
-
     def create_index(self):
         '''Realiza indexación en base a directorio de in.
 
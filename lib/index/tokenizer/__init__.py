@@ -4,11 +4,16 @@
 - Nombre: __init__.py (tokenizer)
 - Descripción: contiene la clase 'Tokenizer' (ver docstring).
 - Autor: Agustín González
-- Modificado: 09/03/18
+- Modificado: 15/10/26
 '''
 
 import os
 import re
+from functools import lru_cache
+
+# Cantidad máxima de tokens normalizados cuya conversión a término se
+# mantiene en caché (ver 'Tokenizer.__normalized2term').
+TERMS_CACHE_SIZE = 200000
 
 
 class Tokenizer(object):
@@ -19,15 +24,27 @@ class Tokenizer(object):
     __no_acutes = "oiaeuuaeiouaeiouaeioaao"
     __translator = str.maketrans(__acutes, __no_acutes)
 
+    # Translator de minúsculas y carácteres especiales: equivale a 'lower()'
+    # seguido de '__translator' (en una única pasada), para todo carácter que
+    # se preserva luego del filtro de no alfabéticos. Además de A-Z, Ñ y las
+    # vocales con tilde, incluye los únicos carácteres no latinos cuya
+    # minúscula es una letra de a-z: İ (i con punto), K (Kelvin) y Å
+    # (Ångström).
+    __fold_translator = str.maketrans(
+        "ABCDEFGHIJKLMNÑOPQRSTUVWXYZ" + __acutes + __acutes.upper() +
+        "\u0130\u212a\u212b",
+        "abcdefghijklmnñopqrstuvwxyz" + __no_acutes + __no_acutes + "ika")
+
     # Regex que permite eliminar carácteres no alfabéticos.
     __no_alpha_regex = re.compile("[^a-zA-Zñ]")
 
-    # Letras del básicas del alfabeto.
-    __letters = 'abcdefghijklmnñopqrstuvwxyz'
+    # Regex que permite eliminar carácteres no alfabéticos de un texto,
+    # preservando los espacios (separadores de tokens).
+    __no_alpha_no_space_regex = re.compile("[^a-zA-Zñ ]")
 
-    # Lista de 3 letras iguales y consecutivas de c/letra del alfabeto (evita
-    # cálculo por c/llamado a función de 'remove_consecutive_letters').
-    __3_equal_consecutive_letters = set("".join([i] * 3) for i in __letters)
+    # Regex de 3 letras iguales y consecutivas de c/letra del alfabeto: permite
+    # eliminar todas las secuencias en una única pasada por el token.
+    __3_equal_consecutive_letters = re.compile(r"([a-zñ])\1\1")
 
     @staticmethod
     def get_stopwords():
@@ -50,8 +67,8 @@ class Tokenizer(object):
                 Tokenizer.__stopwords.append(line[:-1].lower())
 
             # Eliminación de repetidos: además, iterar en un set, es más rápido
-            # que hacerlo sobre un list.
-            Tokenizer.__stopwords = set(Tokenizer.__stopwords)
+            # que hacerlo sobre un list (inmutable, ya que es compartido).
+            Tokenizer.__stopwords = frozenset(Tokenizer.__stopwords)
             return Tokenizer.__stopwords
 
     @staticmethod
@@ -69,15 +86,37 @@ class Tokenizer(object):
         if len(token) < 4:
             return token
 
-        changed = True
+        sub = Tokenizer.__3_equal_consecutive_letters.subn
 
         # Mientras haya cambios (eliminaciones) en el token...
+        token, changed = sub("", token)
         while changed:
-            changed = False
-            for sequence in Tokenizer.__3_equal_consecutive_letters:
-                if sequence in token:
-                    token = token.replace(sequence, "")
-                    changed = True
+            token, changed = sub("", token)
+        return token
+
+    @staticmethod
+    @lru_cache(maxsize=TERMS_CACHE_SIZE)
+    def __normalized2term(token):
+        '''Convierte token normalizado (sólo letras a-z y ñ, sin tags HTML) a
+        término. Nota: la distribución de los tokens es muy desigual (ley de
+        Zipf), por lo que el resultado se mantiene en caché.
+
+        Args:
+            token (string): token normalizado a convertir.
+
+        Returns:
+            token (string): token convertido, o null si no es un término.
+        '''
+        # Eliminación de letras consecutivas.
+        token = Tokenizer.__remove_consecutive_letters(token)
+
+        # Si el token es una stopword...
+        if token in Tokenizer._stopwords_set:
+            token = None
+        # Si el token tiene un tamaño menor a 3 o mayor a 24...
+        elif len(token) < 3 or len(token) > 24:
+            token = None
+
         return token
 
     @staticmethod
@@ -98,15 +137,12 @@ class Tokenizer(object):
         # token a utoken (no necesario en python 3)
         # token = token.decode('utf-8')
 
-        # Minúsculas, antes de translation.
-        token = token.lower().strip()
-
-        # Eliminación de tildes y carácteres varios.
+        # Minúsculas y eliminación de tildes y carácteres varios.
         # acutes = u"óíáéúüÓÍÁÉÚÜàèìòùÀÈÌÒÙâêîôûÂÊÎÔÛäëïöÄËÏÖåÅãÃõÕ"
         # no_acutes = "oiaeuuOIAEUUaeiouAEIOUaeiouAEIOUaeioAEIOaAaAoO"
         # for i in range(0, len(acutes)):
         #    token = token.replace(acutes[i], no_acutes[i])
-        token = token.translate(Tokenizer.__translator)
+        token = token.translate(Tokenizer.__fold_translator).strip()
 
         # Sólo letras a-z y ñ (español)
         # token = "".join([i for i in token if i.isalpha()])
@@ -119,14 +155,49 @@ class Tokenizer(object):
         if "raquo" in token:
             token = token.replace("raquo", "")
 
-        # Eliminación de letras consecutivas.
-        token = Tokenizer.__remove_consecutive_letters(token)
+        return Tokenizer.__normalized2term(token)
 
-        # Si el token es una stopword...
-        if token in Tokenizer.get_stopwords():
-            token = None
-        # Si el token tiene un tamaño menor a 3 o mayor a 24...
-        elif len(token) < 3 or len(token) > 24:
-            token = None
+    @staticmethod
+    def convert2terms(text):
+        '''Convierte los tokens (separados por espacio) de un texto a términos.
+        Es equivalente a aplicar 'convert2term' sobre c/token, aunque la
+        normalización (minúsculas, tildes y carácteres no alfabéticos) se
+        realiza en una única pasada sobre el texto completo.
 
-        return token
+        Args:
+            text (string): texto a convertir.
+
+        Returns:
+            terms (string list): términos del texto (en orden de aparición).
+        '''
+        text = text.translate(Tokenizer.__fold_translator)
+        text = Tokenizer.__no_alpha_no_space_regex.sub("", text)
+
+        # Normalización de tags (acutes y raquo) HTML. Nota: al no contener
+        # espacios, las secuencias no exceden un token, por lo que se eliminan
+        # sobre el texto completo (y no por c/token).
+        if "acute" in text:
+            text = text.replace("acute", "")
+
+        if "raquo" in text:
+            text = text.replace("raquo", "")
+
+        normalized2term = Tokenizer.__normalized2term
+        terms = []
+
+        for token in text.split(" "):
+            # Nota: las eliminaciones posteriores sólo reducen el tamaño del
+            # token, por lo que los tokens cortos se descartan directamente.
+            if len(token) < 3:
+                continue
+
+            token = normalized2term(token)
+            if token is not None:
+                terms.append(token)
+
+        return terms
+
+
+# Inicialización anticipada de stopwords: evita el acceso (try/except) de
+# 'get_stopwords' por c/token convertido.
+Tokenizer._stopwords_set = Tokenizer.get_stopwords()
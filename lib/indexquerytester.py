@@ -4,10 +4,11 @@
 - Nombre: indexquerytester.py
 - Descripción: tester automático de consultas (queries) a índices.
 - Autor: Agustín González
-- Modificado: 10/04/18
+- Modificado: 15/10/26
 '''
 
 from os import path
+from collections.abc import Mapping, Set, Sized
 from lib.index.tokenizer import Tokenizer
 from lib.index.index import Index
 
@@ -54,27 +55,46 @@ class IndexQueryTester(object):
         '''Filtra las queries cuyos términos están presentes en el vocabulario
         dado. Además, tokeniza cada consulta (query).
 
+        Nota: las consultas se recorren sólo hasta alcanzar el tope, por lo
+        que pueden especificarse de forma perezosa (por ej., un generador de
+        líneas de archivo).
+
         Args:
-            queries (string list): listado de consultas.
+            queries (string iterable): listado de consultas.
             vocabulary (string list): vocab. utilizado para filtrar queries.
             max_queries (int): cantidad tope de queries a seleccionar.
         '''
         # Queries filtradas.
         filtered_queries = []
 
+        # Queries ya filtradas (permite detectar repetidas en O(1)).
+        seen_queries = set()
+
+        # Si el vocabulario no admite búsquedas por hash (por ej., list)...
+        if not isinstance(vocabulary, (Set, Mapping)):
+            vocabulary = frozenset(vocabulary)
+
+        # Cantidad de consultas recorridas.
+        read_queries = 0
+
         for query in queries:
-            tokenized_query = [Tokenizer.convert2term(x) for x in query.split(" ")]
-            tokenized_query = [x.strip() for x in tokenized_query if x]
+            read_queries += 1
 
-            # Delete de repetidos y sort.
-            tokenized_query = list(set(tokenized_query))
-            tokenized_query = sorted(tokenized_query)
+            # Tokenización (los términos ya no contienen espacios), delete de
+            # repetidos y sort.
+            tokenized_query = sorted(set(Tokenizer.convert2terms(query)))
 
             # Si todos los términos de los tokens pertenecen al vocabulario...
             if all((x in vocabulary) for x in tokenized_query):
-                if tokenized_query and tokenized_query not in filtered_queries:
+                key = tuple(tokenized_query)
+                if tokenized_query and key not in seen_queries:
+                    seen_queries.add(key)
                     filtered_queries.append(tokenized_query)
 
+                    # Tope alcanzado: el resto de queries no se selecciona.
+                    if len(filtered_queries) == max_queries:
+                        break
+
         filtered_queries = filtered_queries[:max_queries]
         for tokenized_query in filtered_queries:
             # Stringify.
@@ -82,7 +102,9 @@ class IndexQueryTester(object):
             self.__queries.append(query)
 
         info = ">> Queries resultantes: {0}/{1} queries (tope: {2})"
-        info = info.format(len(self.__queries), len(queries), max_queries)
+        if isinstance(queries, Sized):
+            read_queries = len(queries)
+        info = info.format(len(self.__queries), read_queries, max_queries)
         print(info)
 
     def set_indexes(self, dirindexes):
@@ -122,6 +144,13 @@ class IndexQueryTester(object):
         evtype = "inmemory" if chunks_info_in_memory else "indisk"
         queries_count = len(self.__queries)
 
+        # Nota: los métodos del browser se resuelven fuera de los ciclos, y
+        # los tiempos se acumulan como enteros (en nanoseg.). Además, las
+        # queries se sanitizan una única vez (y no por c/iteración).
+        browse_terms = browser.browse_terms
+        get_benchmark_ns = browser.get_benchmark_ns
+        queries = [Browser.get_terms(query) for query in self.__queries]
+
         iterations = self.__iterations+1
         for i in range(0, iterations):
             info = "{0} ({1}) - evaluación nro. {2}/{3}"
@@ -129,28 +158,28 @@ class IndexQueryTester(object):
             min_time = None
             sum_time = 0
             max_time = 0
-            for query in self.__queries:
+            for query in queries:
                 # Obtención de posting list.
-                browser.browse(query)
+                browse_terms(query)
 
                 # Obtención de benchmark de última búsqueda.
-                time = browser.get_benchmark()
+                time = get_benchmark_ns()
 
                 sum_time += time
 
                 if time > max_time:
                     max_time = time
 
-                if not min_time or time < min_time:
+                if min_time is None or time < min_time:
                     min_time = time
 
             avg_time = sum_time/queries_count
 
-            # Append de times (si no es 'warm-up').
+            # Append de times en ms (si no es 'warm-up').
             if i > 0:
-                min_times.append(min_time*1000)
-                avg_times.append(avg_time*1000)
-                max_times.append(max_time*1000)
+                min_times.append(min_time/10**6)
+                avg_times.append(avg_time/10**6)
+                max_times.append(max_time/10**6)
 
         return index, min_times, avg_times, max_times
 
@@ -173,6 +202,10 @@ class IndexQueryTester(object):
             print("{0} ({1}) ya evaluado.".format(index_name, evtype))
             return
 
+        # Creación de directorio de out (el test puede invocarse de forma
+        # independiente a 'test_indexes()').
+        utils.makedirs(path.dirname(stat_path))
+
         r = self.__execute_query_test(dirindex, chunks_info_in_memory)
         index = r[0]
         stats = r[1:]
@@ -216,6 +249,7 @@ class IndexQueryTester(object):
 
         stat_writter.write(info)
         stat_writter.close()
+        index.close()
 
     def test_indexes(self, chunks_info_in_memory=False):
         '''Testea los índices especificados.
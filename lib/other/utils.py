@@ -4,10 +4,12 @@
 - Nombre: utils.py
 - Descripcion: Contiene strings y funciones de utilidad.
 - Autor: Agustín González
-- Modificado: 01/10/17
+- Modificado: 15/10/26
 '''
 
 import os
+import signal
+import threading
 
 
 def clearscreen():
@@ -25,5 +27,11 @@ def waitexit():
     '''Deja consola en modo espera.'''
     print("Presione CTRL+C para salir...")
 
-    while True:
-        pass
+    # Espera bloqueante (sin consumo de CPU) hasta recibir una señal. En
+    # sistemas sin 'signal.pause' (Windows), se espera un evento que nunca se
+    # activa (CTRL+C interrumpe la espera).
+    try:
+        while True:
+            signal.pause()
+    except AttributeError:
+        threading.Event().wait()